@@ -0,0 +1,270 @@
+# bench/ingest.py
+"""
+Benchmark pipeline ingest ICS của bot (fetch -> parse -> merge/diff -> lên lịch nhắc)
+với feed tổng hợp (bench/synthetic.py) phục vụ qua stub server local (bench/stub_server.py).
+
+Mỗi kích thước feed chạy lần lượt 3 kịch bản giống khi bot chạy thật:
+- cold     : cache rỗng (khởi động lần đầu) -> mọi event sắp tới là event mới
+- unchanged: poll lại, server trả 304
+- changed  : ~1% event sắp tới dời giờ (poll có thay đổi)
+
+Mỗi kịch bản đo thời gian từng bước (bọc các hàm thật của bot.py), độ trễ event loop
+và peak memory (tracemalloc, chạy ở lượt riêng để không làm sai thời gian;
+ICS_PARSE_MODE=process thì không tính được bộ nhớ của worker).
+
+Chạy:
+    python bench/ingest.py --sizes 100,1000,10000,100000
+    python bench/ingest.py --out before.json   # ... đổi code ...
+    python bench/ingest.py --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from loop_lag import lag_monitor  # noqa: E402
+from stub_server import StubState, start_stub  # noqa: E402
+from synthetic import generate_ics  # noqa: E402
+
+SCENARIOS = ("cold", "unchanged", "changed")
+STAGES = ("fetch", "parse", "merge", "diff", "schedule")
+
+
+class StageTimer:
+    """Cộng dồn thời gian (giây) theo tên bước; bọc hàm sync/async của bot."""
+
+    def __init__(self):
+        self.totals: dict[str, float] = defaultdict(float)
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.totals[name] += time.perf_counter() - t
+        return timed
+
+    def wrap_async(self, name, fn):
+        async def timed(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.totals[name] += time.perf_counter() - t
+        return timed
+
+
+def _import_bot(parse_mode: str, db_path: str):
+    # bot.py đọc cấu hình từ env lúc import
+    os.environ.update(BOT_TOKEN="bench", CALENDAR_ICS_URL="http://127.0.0.1/calendar.ics",
+                      STATE_DB=db_path, ICS_PARSE_MODE=parse_mode)
+    os.environ.pop("FEEDS_FILE", None)
+    import logging
+    import bot
+    logging.getLogger().setLevel(logging.WARNING)
+    return bot
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Harness:
+    def __init__(self, bot, workdir: str):
+        self.bot = bot
+        self.workdir = workdir
+        self.timer = StageTimer()
+        self._runs = 0
+
+        # Bọc các bước của pipeline; update_calendar_events tra tên global lúc gọi nên thấy bản bọc
+        bot.fetch_events_from_ics = self.timer.wrap_async("fetch", bot.fetch_events_from_ics)
+        bot._parse_ics_off_loop = self.timer.wrap_async("parse", bot._parse_ics_off_loop)
+        bot.feeds.merge_events = self.timer.wrap("merge", bot.feeds.merge_events)
+        bot.diff_events = self.timer.wrap("diff", bot.diff_events)
+        bot.schedule_reminders = self.timer.wrap("schedule", bot.schedule_reminders)
+
+    def reset(self) -> None:
+        """Trạng thái như bot vừa khởi động, chưa có snapshot."""
+        from event_index import EventIndex
+        from reminders import ReminderEngine
+        from store import EventStore
+
+        bot = self.bot
+        self._runs += 1
+        bot.store.close()
+        bot.store = EventStore(os.path.join(self.workdir, f"state-{self._runs}.sqlite3"))
+        bot.events_cache = EventIndex()
+        bot.reminder_engine = ReminderEngine(bot.send_reminders, bot.REMINDER_MISFIRE_GRACE)
+        for feed in bot.FEEDS:
+            feed.validators = dict.fromkeys(feed.validators)
+            feed.events = []
+
+    async def run_scenario(self, measure_memory: bool) -> dict:
+        bot = self.bot
+        self.timer.totals.clear()
+        monitor = lag_monitor()
+        monitor.start()
+        await asyncio.sleep(0.02)
+        if measure_memory:
+            tracemalloc.start()
+        t = time.perf_counter()
+        await bot.update_calendar_events()
+        update_s = time.perf_counter() - t
+        peak = 0
+        if measure_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+
+        totals = self.timer.totals
+        stages = {
+            # fetch_events_from_ics gồm cả parse -> tách riêng
+            "fetch_ms": (totals["fetch"] - totals["parse"]) * 1000,
+            "parse_ms": totals["parse"] * 1000,
+            "merge_ms": totals["merge"] * 1000,
+            "diff_ms": totals["diff"] * 1000,
+            "schedule_ms": totals["schedule"] * 1000,
+        }
+        lag = monitor.summary()
+        return {
+            **stages,
+            "update_ms": update_s * 1000,
+            "peak_mem_mib": peak / 2 ** 20,
+            "lag_max_ms": lag["max_ms"],
+            "lag_p99_ms": lag["p99_ms"],
+            "events_cached": len(bot.events_cache),
+            "reminders": len(bot.reminder_engine),
+            "reminder_slots": bot.reminder_engine.slot_count,
+        }
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ctf-bench-")
+    bot = _import_bot(args.parse_mode, os.path.join(workdir, "state-0.sqlite3"))
+    harness = Harness(bot, workdir)
+
+    if bot.ICS_PARSE_MODE == "process":
+        bot.parse_pool = ProcessPoolExecutor(max_workers=bot.ICS_PARSE_WORKERS)
+    elif bot.ICS_PARSE_MODE == "thread":
+        bot.parse_pool = ThreadPoolExecutor(max_workers=bot.ICS_PARSE_WORKERS, thread_name_prefix="ics-parse")
+    bot.feed_http = bot.FeedClient(total_timeout=300, connect_timeout=10, retries=0)
+    await bot.feed_http.start()
+
+    state = StubState(b"", latency=args.latency)
+    runner, url = await start_stub(state)
+    bot.FEEDS[0].url = url
+
+    results = []
+    try:
+        for size in args.sizes:
+            now = datetime.now(timezone.utc)
+            bodies = {
+                "cold": generate_ics(size, args.past_ratio, seed=args.seed, now=now),
+                "changed": generate_ics(size, args.past_ratio, seed=args.seed, now=now,
+                                        changed_ratio=args.changed_ratio),
+            }
+            rows = {}
+            for measure_memory in (False, True):
+                harness.reset()
+                for scenario in SCENARIOS:
+                    if scenario in bodies:
+                        state.set_body(bodies[scenario])
+                    r = await harness.run_scenario(measure_memory)
+                    if measure_memory:
+                        rows[scenario]["peak_mem_mib"] = r["peak_mem_mib"]
+                    else:
+                        rows[scenario] = {"size": size, "scenario": scenario,
+                                          "feed_bytes": len(state.body), **r}
+            for scenario in SCENARIOS:
+                results.append(rows[scenario])
+                _print_row(rows[scenario])
+    finally:
+        await bot.feed_http.close()
+        await runner.cleanup()
+        if bot.parse_pool is not None:
+            bot.parse_pool.shutdown()
+        bot.store.close()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parse_mode": bot.ICS_PARSE_MODE,
+        "past_ratio": args.past_ratio,
+        "changed_ratio": args.changed_ratio,
+        "results": results,
+    }
+
+
+_HEADER = (f"{'size':>7} {'scenario':9} {'fetch':>8} {'parse':>8} {'merge':>7} {'diff':>7} {'sched':>8} "
+           f"{'update':>8} {'mem MiB':>8} {'lag max':>8} {'cached':>7} {'remind':>7}")
+
+
+def _print_row(r: dict) -> None:
+    print(f"{r['size']:7d} {r['scenario']:9} {r['fetch_ms']:8.1f} {r['parse_ms']:8.1f} {r['merge_ms']:7.1f} "
+          f"{r['diff_ms']:7.1f} {r['schedule_ms']:8.1f} {r['update_ms']:8.1f} {r['peak_mem_mib']:8.2f} "
+          f"{r['lag_max_ms']:8.1f} {r['events_cached']:7d} {r['reminders']:7d}")
+
+
+def compare(old: dict, new: dict) -> None:
+    """In update_ms / peak_mem_mib / lag_max_ms của 2 lần chạy cạnh nhau (ratio > 1 = chậm hơn)."""
+    before = {(r["size"], r["scenario"]): r for r in old["results"]}
+    print(f"\ncompare {old.get('commit')} -> {new.get('commit')}")
+    print(f"{'size':>7} {'scenario':9} {'update ms':>19} {'ratio':>6} {'mem MiB':>15} {'lag max ms':>17}")
+    for r in new["results"]:
+        o = before.get((r["size"], r["scenario"]))
+        if o is None:
+            continue
+        ratio = r["update_ms"] / o["update_ms"] if o["update_ms"] else float("nan")
+        print(f"{r['size']:7d} {r['scenario']:9} {o['update_ms']:9.1f}→{r['update_ms']:<9.1f} {ratio:6.2f} "
+              f"{o['peak_mem_mib']:7.2f}→{r['peak_mem_mib']:<7.2f} {o['lag_max_ms']:8.1f}→{r['lag_max_ms']:<8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ICS ingest pipeline")
+    parser.add_argument("--sizes", default="100,1000,10000,100000",
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--past-ratio", type=float, default=0.8)
+    parser.add_argument("--changed-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="độ trễ stub server (giây)")
+    parser.add_argument("--parse-mode", default=os.getenv("ICS_PARSE_MODE", "thread"),
+                        choices=("thread", "process", "inline"))
+    parser.add_argument("--out", help="file JSON kết quả (mặc định bench/results/ingest-<commit>.json)")
+    parser.add_argument("--compare", help="file JSON của lần chạy trước để so sánh")
+    args = parser.parse_args()
+
+    print(_HEADER)
+    report = asyncio.run(run(args))
+
+    out = args.out or os.path.join(BENCH_DIR, "results", f"ingest-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench/loop_lag.py
+"""
+Đo độ trễ event loop khi parse ICS theo từng chế độ (giống ICS_PARSE_MODE của bot):
+- inline : parse ngay trong event loop (hành vi cũ)
+- thread : ThreadPoolExecutor
+- process: ProcessPoolExecutor
+
+Chạy:
+    python bench/loop_lag.py --events 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ics_parser  # noqa: E402
+from metrics import Gauge, Histogram, LoopLagMonitor  # noqa: E402
+from synthetic import generate_ics  # noqa: E402
+
+TZ_NAME = "Asia/Bangkok"
+
+
+def lag_monitor(interval: float = 0.01) -> LoopLagMonitor:
+    """LoopLagMonitor của bot, với metric riêng (không đăng ký vào REGISTRY) + giữ mẫu để tính summary()."""
+    return LoopLagMonitor(Histogram("bench_loop_lag_seconds", "", registry=None),
+                          Gauge("bench_loop_lag_recent_max_seconds", "", registry=None),
+                          interval=interval, keep_samples=True)
+
+
+async def run_mode(mode: str, path: str, workers: int) -> dict:
+    pool = None
+    if mode == "thread":
+        pool = ThreadPoolExecutor(max_workers=workers)
+    elif mode == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # warm-up: spawn worker + import module trước khi đo
+        await asyncio.get_running_loop().run_in_executor(pool, ics_parser.EventRecord, "", "", 0.0, None, None)
+
+    monitor = lag_monitor()
+    monitor.start()
+    await asyncio.sleep(0.05)
+    t = time.perf_counter()
+    if pool is None:
+        records = ics_parser.parse_ics_file(path, TZ_NAME)
+    else:
+        records = await asyncio.get_running_loop().run_in_executor(pool, ics_parser.parse_ics_file, path, TZ_NAME)
+    elapsed = time.perf_counter() - t
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    if pool is not None:
+        pool.shutdown()
+    return {"mode": mode, "events": len(records), "parse_s": elapsed, **monitor.summary()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag while parsing ICS")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--past-ratio", type=float, default=0.8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--modes", default="inline,thread,process")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".ics")
+    with os.fdopen(fd, "wb") as f:
+        f.write(generate_ics(args.events, args.past_ratio))
+    try:
+        print(f"{'mode':8} {'events':>7} {'parse s':>8} {'lag max ms':>11} {'lag p99 ms':>11} {'lag mean ms':>12}")
+        for mode in args.modes.split(","):
+            r = await run_mode(mode, path, args.workers)
+            print(f"{r['mode']:8} {r['events']:7d} {r['parse_s']:8.2f} {r['max_ms']:11.1f} "
+                  f"{r['p99_ms']:11.1f} {r['mean_ms']:12.2f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
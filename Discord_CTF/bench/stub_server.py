@@ -0,0 +1,101 @@
+# bench/stub_server.py
+"""
+Stub server ICS chạy local để thử FeedClient / fetch_events_from_ics:
+- Trả về file ICS với ETag + Last-Modified (hỗ trợ 304)
+- Chèn độ trễ (cố định + jitter) và lỗi ngẫu nhiên (status tuỳ chọn hoặc ngắt kết nối)
+
+Chạy:
+    python bench/stub_server.py feed.ics --port 8765 --latency 0.5 --error-rate 0.3
+rồi đặt CALENDAR_ICS_URL=http://127.0.0.1:8765/calendar.ics
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from email.utils import formatdate
+
+from aiohttp import web
+
+
+class StubState:
+    def __init__(self, body: bytes, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, drop_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.requests = 0
+        self.not_modified = 0
+        self.set_body(body)
+
+    def set_body(self, body: bytes) -> None:
+        """Đổi nội dung feed (ETag/Last-Modified đổi theo)."""
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = formatdate(usegmt=True)
+
+
+async def _handle(request: web.Request) -> web.StreamResponse:
+    state: StubState = request.app["stub"]
+    state.requests += 1
+
+    delay = state.latency + random.uniform(0, state.jitter)
+    if delay:
+        await asyncio.sleep(delay)
+
+    if state.drop_rate and random.random() < state.drop_rate:
+        # Giả lập upstream cắt kết nối giữa chừng
+        request.transport.close()
+        return web.Response(status=500)
+    if state.error_rate and random.random() < state.error_rate:
+        return web.Response(status=state.error_status, text="injected error")
+
+    if request.headers.get("If-None-Match") == state.etag:
+        state.not_modified += 1
+        return web.Response(status=304, headers={"ETag": state.etag})
+
+    return web.Response(
+        body=state.body,
+        content_type="text/calendar",
+        headers={"ETag": state.etag, "Last-Modified": state.last_modified},
+    )
+
+
+def make_app(state: StubState) -> web.Application:
+    app = web.Application()
+    app["stub"] = state
+    app.router.add_get("/calendar.ics", _handle)
+    return app
+
+
+async def start_stub(state: StubState, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+    """Khởi động stub trong event loop hiện tại, trả về (runner, url). port=0 -> chọn port trống."""
+    runner = web.AppRunner(make_app(state), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/calendar.ics"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ICS stub server")
+    parser.add_argument("ics_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="độ trễ cố định (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="độ trễ ngẫu nhiên thêm (giây)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="tỉ lệ trả về error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="tỉ lệ cắt kết nối")
+    args = parser.parse_args()
+
+    with open(args.ics_file, "rb") as f:
+        body = f.read()
+    state = StubState(body, args.latency, args.jitter, args.error_rate, args.error_status, args.drop_rate)
+    web.run_app(make_app(state), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# bench/synthetic.py
+"""
+Sinh feed ICS giả lập cho benchmark:
+- n event, một phần đã qua (past_ratio), phần còn lại rải đều trong `horizon_days` tới
+- Trộn: event có TZID (Olson + VTIMEZONE tuỳ chỉnh), event UTC, event cả ngày (VALUE=DATE)
+- DESCRIPTION trộn HTML <a href>, text có URL trần, text không có URL; một số event có thuộc tính URL
+- Dòng dài được fold theo RFC 5545
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+TZIDS = ("Europe/Paris", "America/New_York", "Asia/Bangkok", "Custom/CTF")
+
+_VTIMEZONE_CUSTOM = (
+    "BEGIN:VTIMEZONE",
+    "TZID:Custom/CTF",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0300",
+    "TZOFFSETTO:+0300",
+    "TZNAME:CTF",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+)
+
+
+def _fold(line: str) -> list[str]:
+    out = []
+    while len(line) > 75:
+        out.append(line[:75])
+        line = " " + line[75:]
+    out.append(line)
+    return out
+
+
+def _description(rng: random.Random, i: int) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        return (f'<p>Join <b>CTF #{i}</b>!</p><a href="https://ctftime.org/event/{i}">ctftime</a>'
+                f"<br>Discord: https://discord.gg/x{i}")
+    if kind == 1:
+        return f"Jeopardy CTF, prizes TBA. More info: https://ctf{i}.example.org/ (format: online)"
+    if kind == 2:
+        return f"Onsite finals, no link yet. Team limit 4\\, ID {i}"
+    # HTML hỏng (thiếu dấu đóng) -> đi nhánh fallback
+    return f'<div>Rules <a href="https://broken{i}.example.org/rules>rules</a> <i>unclosed'
+
+
+def _vevent(rng: random.Random, i: int, start: datetime) -> list[str]:
+    lines = ["BEGIN:VEVENT", f"UID:synthetic-{i}@bench.local", "DTSTAMP:20240101T000000Z",
+             f"SUMMARY:Synthetic CTF {i} - {'Quals' if i % 2 else 'Finals'} {start.year}"]
+    kind = i % 4
+    duration = timedelta(hours=rng.choice((24, 36, 48, 72)))
+    if kind == 0:
+        # cả ngày
+        end = start + timedelta(days=rng.choice((1, 2, 3)))
+        lines.append(f"DTSTART;VALUE=DATE:{start:%Y%m%d}")
+        lines.append(f"DTEND;VALUE=DATE:{end:%Y%m%d}")
+    elif kind == 1:
+        lines.append(f"DTSTART:{start:%Y%m%dT%H%M%SZ}")
+        lines.append(f"DTEND:{start + duration:%Y%m%dT%H%M%SZ}")
+    else:
+        tzid = TZIDS[rng.randrange(len(TZIDS))]
+        lines.append(f"DTSTART;TZID={tzid}:{start:%Y%m%dT%H%M%S}")
+        lines.append(f"DTEND;TZID={tzid}:{start + duration:%Y%m%dT%H%M%S}")
+    if i % 5 == 0:
+        lines.append(f"URL:https://ctftime.org/event/{i}/")
+    lines.append("DESCRIPTION:" + _description(rng, i))
+    if i % 7 == 0:
+        lines += ["BEGIN:VALARM", "ACTION:DISPLAY", "TRIGGER:-PT1H", "END:VALARM"]
+    lines.append("END:VEVENT")
+    return lines
+
+
+def generate_ics(n: int, past_ratio: float = 0.8, horizon_days: int = 365, seed: int = 1,
+                 now: datetime = None, changed_ratio: float = 0.0) -> bytes:
+    """
+    Sinh feed ICS n event (mặc định 80% đã qua, giống calendar lưu trữ lâu năm).
+    changed_ratio > 0: dời giờ bắt đầu 26 tiếng của tỉ lệ đó trong số event sắp tới
+    (cùng seed + now -> các event còn lại giữ nguyên, dùng để đo poll có thay đổi).
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    n_past = int(n * past_ratio)
+    change_every = round(1 / changed_ratio) if changed_ratio > 0 else 0
+
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//ctf-bot//bench//EN", *_VTIMEZONE_CUSTOM]
+    for i in range(n):
+        if i < n_past:
+            offset = -timedelta(days=rng.uniform(3, 365 * 10))
+        else:
+            offset = timedelta(days=rng.uniform(0.5, horizon_days))
+        start = (now + offset).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        if change_every and i >= n_past and (i - n_past) % change_every == 0:
+            start += timedelta(hours=26)  # đổi cả ngày (event cả ngày) lẫn giờ
+        for line in _vevent(rng, i, start):
+            lines.extend(_fold(line))
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ICS feed")
+    parser.add_argument("events", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--past-ratio", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        f.write(generate_ics(args.events, args.past_ratio, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
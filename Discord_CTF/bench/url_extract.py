@@ -0,0 +1,78 @@
+# bench/url_extract.py
+"""
+So sánh tách URL từ DESCRIPTION:
+- slow : _clean_url_slow (BeautifulSoup cho mọi description HTML, bản cũ)
+- cold : _clean_url_from_description với cache rỗng (chỉ regex, fallback khi HTML hỏng)
+- warm : gọi lại cùng bộ description (poll sau, cache trúng hết)
+
+Chạy:
+    python bench/url_extract.py --descriptions 5000 --rounds 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ics_parser  # noqa: E402
+from synthetic import _description  # noqa: E402
+
+
+def _time(fn, items: list[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t = time.perf_counter()
+        for s in items:
+            fn(s)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+# Ca HTML dễ bóc sai bằng regex (giá trị href không quote chứa "=", "/>", ...)
+EDGE_CASES = [
+    '<a href=https://u.v/w?x=1>t</a>',
+    '<a class=x href=https://a.b/?q==1&amp;y=2 target=_blank>z</a>',
+    '<a href=https://u.v/>t</a>',
+    '<a href==https://u.v/>t</a>',
+    '<a href=https://u.v/a"b>t</a>',
+    "<p>Link: <a href='https://u.v/?a=1'>here</a></p>",
+]
+
+
+def _cold(s: str):
+    ics_parser._url_cache.clear()
+    return ics_parser._clean_url_from_description(s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URL extraction micro-benchmark")
+    parser.add_argument("--descriptions", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [_description(rng, i) for i in range(args.descriptions)]
+
+    mismatches = [s for s in items + EDGE_CASES if ics_parser._clean_url_slow(s) != _cold(s)]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} results differ from the old extractor, e.g. {mismatches[0]!r}")
+
+    ics_parser.URL_CACHE_SIZE = max(ics_parser.URL_CACHE_SIZE, len(items))
+    slow = _time(ics_parser._clean_url_slow, items, args.rounds)
+    cold = _time(_cold, items, args.rounds)
+    for s in items:
+        ics_parser._clean_url_from_description(s)
+    warm = _time(ics_parser._clean_url_from_description, items, args.rounds)
+
+    n = len(items)
+    print(f"{'variant':8} {'total ms':>9} {'us/desc':>8} {'speedup':>8}")
+    for name, t in (("slow", slow), ("cold", cold), ("warm", warm)):
+        print(f"{name:8} {t * 1000:9.1f} {t / n * 1e6:8.2f} {slow / t:7.1f}x")
+    print("cache:", ics_parser.url_cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,196 @@
 # bot.py
 import os
-import re
 import asyncio
+import hashlib
+import hmac
+import tempfile
+from time import monotonic
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import islice
 import logging
-from datetime import datetime, date, time, timedelta, timezone
+from datetime import datetime, time, timedelta, timezone
 from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Iterable, Optional
 
 import aiohttp
 import discord
+from aiohttp import web
 from discord import app_commands
 from discord.ext import commands, tasks
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from icalendar import Calendar
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+
+import ics_parser
+from event_index import CTFEvent, EventIndex
+from store import EventStore
+from reminders import ReminderEngine, Reminder
+from feed_client import FeedClient, CircuitOpenError
+from dispatcher import OutboundDispatcher
+import metrics
+from metrics import Counter, Gauge, Histogram
+import feeds
+from feeds import Feed
+from event_diff import EventChange, diff_events
+from polling import AdaptiveInterval
 
 load_dotenv()
 
 # --------- ENV ---------
 TOKEN = os.getenv("BOT_TOKEN")
 CALENDAR_ICS_URL = os.getenv("CALENDAR_ICS_URL")  # full ICS URL (public .ics)
+FEEDS_FILE = os.getenv("FEEDS_FILE")  # tùy chọn: JSON nhiều calendar + định tuyến guild (xem feeds.py)
+FEED_CONCURRENCY = int(os.getenv("FEED_CONCURRENCY", "4"))  # số feed fetch cùng lúc
 CATEGORY_NAME = os.getenv("CATEGORY_NAME", "CTF")
 CHANNEL_NAME = os.getenv("CHANNEL_NAME", "announcement")
 ANNOUNCE_CHANNEL_ID = int(os.getenv("ANNOUNCE_CHANNEL_ID", "0"))  # tùy chọn: set ID -> chắc chắn đúng kênh
 LOCAL_TZ_NAME = os.getenv("TIMEZONE", "Asia/Bangkok")
-
-if not TOKEN or not CALENDAR_ICS_URL:
-    raise SystemExit("Missing BOT_TOKEN or CALENDAR_ICS_URL in .env")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))  # giây, tổng thời gian 1 request
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5"))  # số lần poll lỗi liên tiếp trước khi ngắt
+CIRCUIT_RESET = float(os.getenv("CIRCUIT_RESET", "300"))  # giây chờ trước khi thử lại
+ICS_PARSE_MODE = os.getenv("ICS_PARSE_MODE", "thread")  # thread | process | inline
+ICS_PARSE_WORKERS = int(os.getenv("ICS_PARSE_WORKERS", "1"))
+CACHE_FRESHNESS = float(os.getenv("CACHE_FRESHNESS", "120"))  # giây; cache cũ hơn -> refresh nền
+STATE_DB = os.getenv("STATE_DB", "ctf_state.sqlite3")  # snapshot event + reminder cho warm start
+# Event lặp (RRULE/RDATE) chỉ bung các lần xuất hiện trong chừng này ngày tới
+RECURRENCE_HORIZON = float(os.getenv("RECURRENCE_HORIZON_DAYS", "60")) * 86400
+# Nhắc nhở bị lỡ (bot tắt / loop bận) vẫn gửi nếu trễ không quá số giây này; để trống = luôn gửi
+_misfire = os.getenv("REMINDER_MISFIRE_GRACE", "21600").strip()
+REMINDER_MISFIRE_GRACE: Optional[int] = int(_misfire) if _misfire else None
+SEND_RATE = int(os.getenv("SEND_RATE", "5"))  # tối đa SEND_RATE tin / SEND_PER giây mỗi kênh
+SEND_PER = float(os.getenv("SEND_PER", "5"))
+SEND_RETRIES = int(os.getenv("SEND_RETRIES", "4"))
+# HTTP local: /metrics + (khi có PUSH_TOKEN) push ICS / refresh ngay. Port 0 = tắt.
+# METRICS_HOST / METRICS_PORT là tên cũ, vẫn được đọc.
+LOCAL_HTTP_HOST = os.getenv("LOCAL_HTTP_HOST", os.getenv("METRICS_HOST", "127.0.0.1"))
+LOCAL_HTTP_PORT = int(os.getenv("LOCAL_HTTP_PORT", os.getenv("METRICS_PORT", "0")))
+PUSH_TOKEN = os.getenv("PUSH_TOKEN", "")  # Bearer token bắt buộc cho POST /refresh, /feeds/{name}/ics
+PUSH_MAX_BYTES = int(os.getenv("PUSH_MAX_BYTES", str(50 * 2 ** 20)))
+# Poll thích ứng: có thay đổi -> POLL_MIN giây; không đổi -> nhân POLL_BACKOFF tới POLL_MAX
+POLL_MIN = float(os.getenv("POLL_MIN", "120"))
+POLL_MAX = float(os.getenv("POLL_MAX", "3600"))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", "2"))
+
+if not TOKEN or not (CALENDAR_ICS_URL or FEEDS_FILE):
+    raise SystemExit("Missing BOT_TOKEN or CALENDAR_ICS_URL/FEEDS_FILE in .env")
+if ICS_PARSE_MODE not in ("thread", "process", "inline"):
+    raise SystemExit("ICS_PARSE_MODE must be one of: thread, process, inline")
 
 LOCAL_TZ = ZoneInfo(LOCAL_TZ_NAME)
 
+FEEDS, GUILD_CONFIGS = feeds.load_feeds(FEEDS_FILE, CALENDAR_ICS_URL)
+if not FEEDS:
+    raise SystemExit(f"No feeds configured in {FEEDS_FILE}")
+FEEDS_BY_NAME = {feed.name: feed for feed in FEEDS}
+# Cấu hình cũ (1 calendar, không FEEDS_FILE) + ANNOUNCE_CHANNEL_ID -> chỉ post vào đúng kênh đó như trước,
+# không tự post sang kênh #announcement của các guild khác
+_PINNED_CHANNEL_ONLY = bool(ANNOUNCE_CHANNEL_ID) and not FEEDS_FILE
+# Guild được feed chỉ định rõ -> được phép fallback sang kênh text bất kỳ
+_ROUTED_GUILDS = set(GUILD_CONFIGS).union(*(feed.guild_ids or () for feed in FEEDS))
+
 # --------- LOGGING ---------
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("ctf-bot")
 
+# --------- METRICS ---------
+FETCH_SECONDS = Histogram("ctf_feed_fetch_seconds", "ICS download time per feed (excluding parse)", ("feed",))
+FETCH_RESULTS = Counter("ctf_feed_fetch_total", "Feed polls by result", ("feed", "result"))
+PARSE_SECONDS = Histogram("ctf_ics_parse_seconds", "ICS parse time per changed feed")
+UPDATE_SECONDS = Histogram("ctf_update_seconds", "Duration of update_calendar_events")
+LAST_UPDATE = Gauge("ctf_last_update_timestamp_seconds", "Unix time of the last successful calendar sync")
+EVENT_CHANGES = Counter("ctf_event_changes_total", "Calendar changes applied", ("kind",))
+EVENTS_CACHED = Gauge("ctf_events_cached", "Events in the in-memory index")
+REMINDERS_PENDING = Gauge("ctf_reminders_pending", "Reminders waiting to fire")
+REMINDER_SLOTS = Gauge("ctf_reminder_slots", "Distinct reminder fire times")
+REMINDERS_FIRED = Counter("ctf_reminders_fired_total", "Reminders by outcome", ("result",))
+REMINDER_DELAY = Histogram("ctf_reminder_fire_delay_seconds", "How late reminder slots fire",
+                           buckets=(0.01, 0.1, 0.5, 1, 5, 30, 60, 300, 3600, 21600))
+OUTBOUND_DEPTH = Gauge("ctf_outbound_queue_depth", "Messages waiting in the outbound dispatcher")
+LOOP_LAG = Histogram("ctf_event_loop_lag_seconds", "Event-loop scheduling delay",
+                     buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+LOOP_LAG_MAX = Gauge("ctf_event_loop_lag_recent_max_seconds", "Max event-loop lag over the last minute")
+GATEWAY_LATENCY = Gauge("ctf_gateway_latency_seconds", "Discord gateway heartbeat latency")
+URL_CACHE = Gauge("ctf_url_cache", "Description URL cache statistics", ("stat",))
+NEXT_POLL = Gauge("ctf_next_poll_seconds", "Delay chosen for the next ICS poll")
+PUSHES = Counter("ctf_push_requests_total", "Local push / refresh requests by result", ("kind", "result"))
+
 # --------- DISCORD ---------
+class CTFClient(discord.Client):
+    async def close(self):
+        # 1) Chặn mọi nguồn việc mới: poll theo lịch, push/refresh qua HTTP local, nhắc nhở, refresh đang chạy
+        global feed_http, parse_pool, http_runner
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
+        if http_runner is not None:
+            await http_runner.cleanup()
+            http_runner = None
+        await reminder_engine.stop()
+        if _refresh_task is not None and not _refresh_task.done():
+            _refresh_task.cancel()
+            try:
+                await _refresh_task
+            except asyncio.CancelledError:
+                pass
+        # 2) Tài nguyên refresh dùng: HTTP session dùng chung, pool parse
+        if feed_http is not None:
+            await feed_http.close()
+            feed_http = None
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+            parse_pool = None
+        await loop_lag.stop()
+        # 3) Gửi nốt tin đang chờ trong hàng đợi trước khi ngắt gateway
+        await dispatcher.close()
+        # 4) Store đóng sau cùng: không còn ai ghi
+        store.close()
+        await super().close()
+
+
 intents = discord.Intents.default()
-client = discord.Client(intents=intents)
+client = CTFClient(intents=intents)
 tree = app_commands.CommandTree(client)
 
 scheduler = AsyncIOScheduler(timezone=LOCAL_TZ)
-# cache: uid -> { uid, summary, start_local, start_utc, end_local, end_utc, url }
-events_cache: dict[str, dict] = {}
+store = EventStore(STATE_DB)
+# cache: uid -> CTFEvent, sắp theo start_utc
+events_cache = EventIndex()
+# Kênh post announce/reminder của từng guild: guild_id -> channel (resolve trong on_ready)
+announcement_channels: dict[int, discord.TextChannel] = {}
+# Hàng đợi gửi tin theo kênh (gộp tin + giới hạn tốc độ); mọi tin announce/reminder đi qua đây
+dispatcher = OutboundDispatcher(rate=SEND_RATE, per=SEND_PER, max_retries=SEND_RETRIES)
+# HTTP client dùng chung (tạo trong on_ready, đóng trong CTFClient.close)
+feed_http: Optional[FeedClient] = None
+# Pool parse ICS (None khi ICS_PARSE_MODE=inline hoặc chưa khởi tạo)
+parse_pool: Optional[Executor] = None
+# Thời điểm (monotonic) cache được đồng bộ thành công với ICS lần cuối
+last_refresh_at: Optional[float] = None
+# Cache đã có dữ liệu để trả lời (từ snapshot warm start hoặc refresh thành công), dù có thể đã cũ
+cache_loaded = False
+# Task refresh đang chạy (single-flight: mọi yêu cầu refresh dùng chung task này)
+_refresh_task: Optional[asyncio.Task] = None
+# Poll và push không được chạy chồng lên nhau (cùng sửa feed.events / cache)
+_update_lock = asyncio.Lock()
+poll_interval = AdaptiveInterval(POLL_MIN, POLL_MAX, POLL_BACKOFF)
+# Đo lag event loop (heartbeat gateway chạy trên cùng loop) + HTTP local (tùy chọn)
+loop_lag = metrics.LoopLagMonitor(LOOP_LAG, LOOP_LAG_MAX)
+http_runner: Optional[web.AppRunner] = None
+
+# Gauge tính lúc scrape (tra tên global lúc gọi -> luôn thấy object hiện tại)
+EVENTS_CACHED.set_function(lambda: len(events_cache))
+REMINDERS_PENDING.set_function(lambda: len(reminder_engine))
+REMINDER_SLOTS.set_function(lambda: reminder_engine.slot_count)
+OUTBOUND_DEPTH.set_function(lambda: dispatcher.depth())
+GATEWAY_LATENCY.set_function(lambda: client.latency if client.latency == client.latency else 0.0)  # NaN khi chưa kết nối
+for _stat in ("hits", "misses", "fallbacks", "size"):
+    URL_CACHE.labels(_stat).set_function(lambda stat=_stat: ics_parser.url_cache_info()[stat])
 
 # =========================================================
 # Utils
 # =========================================================
-def _clean_url_from_description(description: Optional[str]) -> Optional[str]:
-    """
-    Nhận vào DESCRIPTION (có thể chứa HTML hoặc text thuần),
-    trả về URL sạch nếu có, ngược lại None.
-    """
-    if not description:
-        return None
-
-    s = str(description)
-
-    # 1) Nếu có HTML -> bóc bằng BeautifulSoup
-    if "<" in s and ">" in s and ("<a" in s.lower() or "</" in s.lower()):
-        soup = BeautifulSoup(s, "html.parser")
-        a = soup.find("a", href=True)
-        if a and a["href"]:
-            return a["href"].strip()
-        # fallback: lấy text rồi regex
-        s = soup.get_text(" ", strip=True)
-
-    # 2) Regex lấy URL đầu tiên
-    m = re.search(r"https?://[^\s<>\"]+", s)
-    if m:
-        url = m.group(0)
-        # Loại bỏ ký tự thừa cuối chuỗi nếu có
-        url = url.rstrip(").,;\">')")
-        return url
-
-    return None
-
-
-def format_event_block(ev: dict) -> str:
+def format_event_block(ev: CTFEvent) -> str:
     """
     Dùng chung cho announce + slash command.
     Trả về block text:
@@ -85,359 +198,801 @@ def format_event_block(ev: dict) -> str:
     🗓️ dd-mm-YYYY HH:MM [ - dd-mm-YYYY HH:MM]
     🔗 url
     """
-    start_local = ev["start_local"]
-    end_local = ev.get("end_local")
+    start_local = ev.start_local
+    end_local = ev.end_local
     time_range = start_local.strftime("%d-%m-%Y %H:%M")
     if end_local:
         time_range += " - " + end_local.strftime("%d-%m-%Y %H:%M")
 
-    url = ev.get("url") or ""
-    return f"**{ev['summary']}**\n🗓️ {time_range}\n🔗 {url}"
+    url = ev.url or ""
+    return f"**{ev.summary}**\n🗓️ {time_range}\n🔗 {url}"
+
+
+def event_guild_ids(ev: CTFEvent) -> Optional[set[int]]:
+    """Các guild nhận thông báo của event (hợp các feed chứa nó). None = mọi guild."""
+    guild_ids: set[int] = set()
+    for name in ev.feeds:
+        feed = FEEDS_BY_NAME.get(name)
+        if feed is None:
+            continue
+        if feed.guild_ids is None:
+            return None
+        guild_ids |= feed.guild_ids
+    return guild_ids if ev.feeds else None
+
+
+def channels_for(ev: CTFEvent) -> list[discord.TextChannel]:
+    guild_ids = event_guild_ids(ev)
+    if guild_ids is None:
+        return list(announcement_channels.values())
+    return [announcement_channels[gid] for gid in guild_ids if gid in announcement_channels]
+
+
+def routed_to(ev: CTFEvent, guild_id: Optional[int]) -> bool:
+    if guild_id is None:
+        return True
+    guild_ids = event_guild_ids(ev)
+    return guild_ids is None or guild_id in guild_ids
+
+
+def _send_to_channels(channels: list[discord.TextChannel], messages: list[str], what: str):
+    """
+    Đưa messages vào hàng đợi gửi của từng kênh (dispatcher lo gộp tin, rate limit, retry).
+    Không chờ gửi xong; lỗi ở 1 kênh không ảnh hưởng kênh khác.
+    """
+    if not channels:
+        log.warning("No announcement channel; %s skipped", what)
+        return
+    for ch in channels:
+        for msg in messages:
+            dispatcher.submit(ch, msg)
+        log.info("Queued %s for #%s (%s), queue depth %d", what, ch.name, ch.guild.name, dispatcher.depth(ch.id))
 
 
 # =========================================================
 # ICS fetch/parse
 # =========================================================
-async def fetch_events_from_ics(session: aiohttp.ClientSession) -> list[dict]:
+async def _spool_stream(content: aiohttp.StreamReader, max_bytes: Optional[int] = None) -> tuple[str, str]:
+    """
+    Ghi body ra file tạm theo từng chunk (không giữ cả feed trong RAM) và tính hash.
+    Trả về (path, sha256). Vượt max_bytes -> ValueError.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="ctf-ics-", suffix=".ics")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in content.iter_chunked(ics_parser.CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"ICS body larger than {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+async def _spool_ics(resp: aiohttp.ClientResponse) -> tuple[int, Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """Trả về (status, path, sha256, etag, last_modified); 304 -> không có body."""
+    if resp.status == 304:
+        return resp.status, None, None, None, None
+    path, body_hash = await _spool_stream(resp.content)
+    return resp.status, path, body_hash, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+
+async def _parse_ics_off_loop(path: str, now_ts: float, horizon_ts: float) -> list[ics_parser.EventRecord]:
     """
-    Fetch ICS và trả về list event dict:
-    { uid, summary, start_local, start_utc, end_local, end_utc, url }
-    - start_local luôn ở LOCAL_TZ
-    - start_utc luôn UTC
-    - url lấy ưu tiên thuộc tính URL (nếu có), nếu không có thì bóc từ DESCRIPTION
+    Parse file ICS trong parse_pool (thread/process) để không chặn event loop
+    (heartbeat gateway, slash command). ICS_PARSE_MODE=inline -> parse ngay trong loop.
     """
-    async with session.get(CALENDAR_ICS_URL) as resp:
-        ics_text = await resp.text()
+    if parse_pool is None:
+        return ics_parser.parse_ics_file(path, LOCAL_TZ_NAME, now_ts, horizon_ts)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_pool, ics_parser.parse_ics_file, path, LOCAL_TZ_NAME, now_ts, horizon_ts)
 
-    cal = Calendar.from_ical(ics_text)
-    results: list[dict] = []
 
-    for comp in cal.walk():
-        if comp.name != "VEVENT":
-            continue
+async def fetch_events_from_ics(http: FeedClient, feed: Feed) -> Optional[list[CTFEvent]]:
+    """
+    Fetch ICS của 1 feed và trả về list CTFEvent (chưa kết thúc), sort theo start_utc.
+    Body được stream ra file tạm rồi parse từng VEVENT (xem ics_parser).
+    Trả về None nếu ICS không đổi so với lần trước (304 hoặc cùng hash body).
+    Feed có event lặp: cửa sổ bung trượt theo thời gian nên mỗi ngày parse lại 1 lần
+    dù ICS không đổi (để các lần xuất hiện mới lọt vào cửa sổ).
+    """
+    ics_validators = feed.validators
+    now_ts = datetime.now(timezone.utc).timestamp()
+    horizon_ts = now_ts + RECURRENCE_HORIZON
+    recurring_until = ics_validators["recurring_until"]
+    reexpand = recurring_until is not None and float(recurring_until) + 86400 <= horizon_ts
+
+    headers = {}
+    if ics_validators["etag"] and not reexpand:
+        headers["If-None-Match"] = ics_validators["etag"]
+    if ics_validators["last_modified"] and not reexpand:
+        headers["If-Modified-Since"] = ics_validators["last_modified"]
+
+    with FETCH_SECONDS.labels(feed.name).time():
+        status, path, body_hash, etag, last_modified = await http.fetch(
+            feed.url, headers=headers, consume=_spool_ics
+        )
+    if status == 304:
+        return None
 
-        uid = str(comp.get("uid"))
-        summary = str(comp.get("summary", "No title"))
+    if body_hash == ics_validators["body_hash"] and not reexpand:
+        # Server không hỗ trợ validator nhưng nội dung y hệt -> bỏ qua parse
+        os.remove(path)
+        ics_validators["etag"] = etag
+        ics_validators["last_modified"] = last_modified
+        return None
 
-        # dtstart / dtend có thể là date hoặc datetime
-        try:
-            dtstart = comp.decoded("dtstart")
-        except Exception:
-            continue
-        dtend = None
-        try:
-            dtend = comp.decoded("dtend")
-        except Exception:
-            dtend = None
-
-        # Date -> Datetime @ 00:00
-        if isinstance(dtstart, date) and not isinstance(dtstart, datetime):
-            dtstart = datetime.combine(dtstart, time.min)
-        if isinstance(dtend, date) and not isinstance(dtend, datetime):
-            dtend = datetime.combine(dtend, time.min)
-
-        # Nếu naive -> assume LOCAL_TZ
-        if dtstart.tzinfo is None:
-            dtstart = dtstart.replace(tzinfo=LOCAL_TZ)
-        if dtend is not None and dtend.tzinfo is None:
-            dtend = dtend.replace(tzinfo=LOCAL_TZ)
-
-        # Chuẩn hóa hai dạng
-        start_local = dtstart.astimezone(LOCAL_TZ)
-        start_utc = start_local.astimezone(timezone.utc)
-
-        end_local = None
-        end_utc = None
-        if dtend is not None:
-            end_local = dtend.astimezone(LOCAL_TZ)
-            end_utc = end_local.astimezone(timezone.utc)
-
-        # Ưu tiên thuộc tính URL trong ICS nếu có
-        ical_url = comp.get("url")
-        ical_url = str(ical_url) if ical_url else None
-
-        # Nếu không có, bóc từ description
-        description = comp.get("description")
-        desc_url = _clean_url_from_description(str(description) if description else None)
-
-        final_url = ical_url or desc_url
-
-        results.append({
-            "uid": uid,
-            "summary": summary,
-            "start_local": start_local,
-            "start_utc": start_utc,
-            "end_local": end_local,
-            "end_utc": end_utc,
-            "url": final_url,
-        })
-
-    # sort theo start_utc
-    results.sort(key=lambda e: e["start_utc"])
+    results = await _load_spooled_ics(feed, path, body_hash, now_ts)
+    # Chỉ ghi nhận validator sau khi parse thành công, để lần sau không nhận 304 cho ICS lỗi
+    ics_validators["etag"] = etag
+    ics_validators["last_modified"] = last_modified
+    return results
+
+
+async def _load_spooled_ics(feed: Feed, path: str, body_hash: str, now_ts: float) -> list[CTFEvent]:
+    """Parse file ICS đã spool (rồi xoá file) thành CTFEvent của `feed`; cập nhật body_hash / recurring_until."""
+    horizon_ts = now_ts + RECURRENCE_HORIZON
+    try:
+        with open(path, "rb") as f:
+            head = f.read(1024).lstrip(b"\xef\xbb\xbf \t\r\n")
+        if not head.upper().startswith(b"BEGIN:VCALENDAR"):
+            # Trang lỗi HTML / body rác -> giữ event cũ thay vì coi như feed rỗng
+            raise ValueError("body is not an iCalendar (missing BEGIN:VCALENDAR)")
+        with PARSE_SECONDS.time():
+            records = await _parse_ics_off_loop(path, now_ts, horizon_ts)
+    finally:
+        os.remove(path)
+
+    results = [CTFEvent.from_record(rec, LOCAL_TZ) for rec in records]
+    for ev in results:
+        ev.feeds = (feed.name,)
+    feed.validators["body_hash"] = body_hash
+    feed.validators["recurring_until"] = str(horizon_ts) if any(rec.recurrence_id for rec in records) else None
     return results
 
 
 # =========================================================
 # Announcement helpers
 # =========================================================
-async def send_initial_announcement(event: dict):
+def send_initial_announcement(event: CTFEvent):
     """
-    Gửi thông báo ngay khi phát hiện event mới.
+    Gửi thông báo ngay khi phát hiện event mới (tới các guild của event).
     """
-    global announcement_channel
-    if not announcement_channel:
-        log.warning("No announcement channel; initial announce skipped for %s", event["summary"])
-        return
-
     msg = "📣 **Mới có event:**\n" + format_event_block(event)
-    try:
-        await announcement_channel.send(msg)
-        log.info("Sent initial announcement for %s", event["summary"])
-    except Exception:
-        log.exception("Failed to send initial announcement for %s", event["summary"])
-
-
-async def send_update_announcement(event: dict, old_start_utc: datetime):
+    _send_to_channels(channels_for(event), [msg], f"initial announcement for {event.summary}")
+
+
+def _format_change_block(change: EventChange) -> str:
+    old, new, fields = change
+    lines = [f"**{new.summary}**"]
+    if "summary" in fields:
+        lines.append(f"✏️ Tên cũ: {old.summary}")
+    if "start_utc" in fields:
+        lines.append(f"🕒 Cũ: {old.start_local.strftime('%d-%m-%Y %H:%M')}")
+        lines.append(f"🗓️ Mới: {new.start_local.strftime('%d-%m-%Y %H:%M')}")
+    if "end_utc" in fields:
+        old_end = old.end_local.strftime("%d-%m-%Y %H:%M") if old.end_local else "?"
+        new_end = new.end_local.strftime("%d-%m-%Y %H:%M") if new.end_local else "?"
+        lines.append(f"🏁 Kết thúc: {old_end} → {new_end}")
+    lines.append(f"🔗 {new.url or ''}" + (" (link mới)" if "url" in fields and new.url else ""))
+    return "\n".join(lines)
+
+
+def send_change_notice(changes: list[EventChange]):
     """
-    Gửi thông báo khi thời gian bắt đầu thay đổi.
+    Gửi 1 thông báo tổng hợp cho mọi event đổi nội dung trong lần poll này
+    (mỗi kênh chỉ nhận các event được định tuyến tới guild của kênh).
+    Chỉ đổi giờ bắt đầu -> giữ tiêu đề cũ "thay đổi thời gian".
     """
-    global announcement_channel
-    if not announcement_channel:
-        log.warning("No announcement channel; update announce skipped for %s", event["summary"])
-        return
+    per_channel: dict[int, tuple[discord.TextChannel, list[EventChange]]] = {}
+    for change in changes:
+        for ch in channels_for(change.new):
+            per_channel.setdefault(ch.id, (ch, []))[1].append(change)
 
-    new_local = event["start_local"].strftime("%d-%m-%Y %H:%M")
-    old_local = old_start_utc.astimezone(LOCAL_TZ).strftime("%d-%m-%Y %H:%M")
-    url = event.get("url") or ""
-    msg = (
-        f"# 🔁 **Event đã thay đổi thời gian:**\n"
-        f"**{event['summary']}**\n"
-        f"🕒 Cũ: {old_local}\n"
-        f"🗓️ Mới: {new_local}\n"
-        f"🔗 {url}"
-    )
-    try:
-        await announcement_channel.send(msg)
-        log.info("Sent update announcement for %s", event["summary"])
-    except Exception:
-        log.exception("Failed to send update announcement for %s", event["summary"])
+    for ch, items in per_channel.values():
+        items.sort(key=lambda c: c.new.start_utc)
+        only_time = all(c.fields - {"feeds"} == {"start_utc"} for c in items)
+        header = "# 🔁 **Event đã thay đổi thời gian:**" if only_time else "# 🔁 **Event đã thay đổi:**"
+        blocks = [_format_change_block(c) for c in items]
+        blocks[0] = f"{header}\n{blocks[0]}"
+        _send_to_channels([ch], blocks, f"change notice ({len(items)} events)")
 
 
 # =========================================================
 # Scheduler / Reminder logic
 # =========================================================
-def schedule_event_reminders(event: dict):
-    """
-    Với mỗi sự kiện:
-      - Nhắc vào 00:00 local các ngày D-1, D-2, D-3
-      - Nhắc 1h trước khi bắt đầu
-    """
-    uid = event["uid"]
-    start_local = event["start_local"]
-    now_utc = datetime.now(timezone.utc)
+def _reminder_job_id(uid: str, which) -> str:
+    return f"{uid}-remind-hour" if which == "hour" else f"{uid}-remind-day-{which}"
+
+
+def remove_reminders(uids: Iterable[str]):
+    uids = list(uids)
+    for uid in uids:
+        reminder_engine.remove_event(uid)
+    if uids:
+        store.delete_reminders(uids=uids)
 
+
+def _reminder_times(event: CTFEvent, now_utc: datetime) -> dict:
+    """which -> thời điểm nhắc (local) của các nhắc nhở còn ở tương lai."""
+    times = {}
     # 3 ngày trước, 00:00 local
-    event_date_local = start_local.date()
+    event_date_local = event.start_local.date()
     for i in range(1, 4):
         remind_date = event_date_local - timedelta(days=i)
         remind_dt_local = datetime.combine(remind_date, time.min).replace(tzinfo=LOCAL_TZ)
-
         if remind_dt_local.astimezone(timezone.utc) > now_utc:
-            job_id = f"{uid}-remind-day-{i}"
-            if not scheduler.get_job(job_id):
-                scheduler.add_job(send_reminder_job, "date", run_date=remind_dt_local, args=[uid, i], id=job_id)
-                log.info("Scheduled 00:00 reminder for %s (D-%d) at %s",
-                         event["summary"], i, remind_dt_local.isoformat())
+            times[i] = remind_dt_local
 
     # 1 giờ trước
-    one_hour_before_local = (start_local - timedelta(hours=1)).astimezone(LOCAL_TZ)
+    one_hour_before_local = (event.start_local - timedelta(hours=1)).astimezone(LOCAL_TZ)
     if one_hour_before_local.astimezone(timezone.utc) > now_utc:
-        job_id = f"{uid}-remind-hour"
-        if not scheduler.get_job(job_id):
-            scheduler.add_job(send_reminder_job, "date", run_date=one_hour_before_local, args=[uid, "hour"], id=job_id)
-            log.info("Scheduled 1-hour reminder for %s at %s",
-                     event["summary"], one_hour_before_local.isoformat())
+        times["hour"] = one_hour_before_local
+    return times
 
 
-async def send_reminder(uid: str, which):
-    event = events_cache.get(uid)
-    if not event:
-        log.warning("Event %s not found in cache when sending reminder", uid)
-        return
+def schedule_reminders(events: Iterable[CTFEvent]):
+    """
+    Với mỗi sự kiện:
+      - Nhắc vào 00:00 local các ngày D-1, D-2, D-3
+      - Nhắc 1h trước khi bắt đầu
+    Nhắc nhở được gom theo thời điểm trong reminder_engine và ghi vào store
+    (cả lô trong 1 transaction) để khôi phục sau khi restart.
+    Gọi lại khi giờ bắt đầu đổi: chỉ nhắc nhở có thời điểm khác mới bị xoá / thêm,
+    nhắc nhở trùng thời điểm cũ (vd. D-2 khi event dời vài giờ trong ngày) giữ nguyên.
+    """
+    now = datetime.now(timezone.utc)
+    added: list[tuple[str, str, object, float]] = []
+    dropped: list[str] = []
+    for event in events:
+        uid = event.uid
+        times = _reminder_times(event, now)
+
+        for which in reminder_engine.for_event(uid).keys() - times.keys():
+            reminder_engine.remove(uid, which)
+            dropped.append(_reminder_job_id(uid, which))
+            log.info("Dropped stale reminder for %s (%s)", event.summary, which)
+
+        for which, run_date in times.items():
+            fire_ts = run_date.timestamp()
+            if reminder_engine.add(uid, which, fire_ts):
+                added.append((_reminder_job_id(uid, which), uid, which, fire_ts))
+                log.info("Scheduled %s reminder for %s at %s",
+                         "1-hour" if which == "hour" else f"00:00 (D-{which})", event.summary, run_date.isoformat())
+
+    if dropped:
+        store.delete_reminders(job_ids=dropped)
+    if added:
+        store.add_reminders(added)
+
+
+def _due_reminders(reminders: list[Reminder]) -> list[tuple[CTFEvent, object]]:
+    """Lọc nhắc nhở còn ý nghĩa: event còn trong cache và chưa bắt đầu."""
+    now = datetime.now(timezone.utc)
+    due = []
+    for uid, which in reminders:
+        event = events_cache.get(uid)
+        if not event:
+            log.warning("Event %s not found in cache when sending reminder", uid)
+            continue
+        if event.start_utc <= now:
+            # Nhắc nhở bị lỡ tới sau giờ bắt đầu -> không còn ý nghĩa
+            log.info("Skipped late reminder for %s (%s): event already started", event.summary, which)
+            continue
+        due.append((event, which))
+    return due
 
-    prefix = "⏰ Còn 1 tiếng nữa!" if which == "hour" else f"🔔 Còn {which} ngày nữa!"
-    start_str = event["start_local"].strftime("%d-%m-%Y %H:%M")
-    url = event.get("url") or ""
-    msg = f"{prefix}\n**{event['summary']}**\n🗓️ Bắt đầu: {start_str}\n🔗 {url}"
-
-    global announcement_channel
-    if announcement_channel:
-        try:
-            await announcement_channel.send(msg)
-            log.info("Sent reminder for %s (%s)", event["summary"], which)
-        except Exception:
-            log.exception("Failed to send reminder for %s", event["summary"])
-    else:
-        log.warning("No announcement channel; reminder not sent: %s", event["summary"])
+
+def format_reminder_digest(due: list[tuple[CTFEvent, object]]) -> list[str]:
+    """
+    Các block của digest cho những nhắc nhở tới hạn cùng lúc; dispatcher gộp
+    chúng thành ít tin nhất có thể (mỗi tin <= 2000 ký tự).
+    1 nhắc nhở -> giữ nguyên format cũ.
+    """
+    groups: dict = {}
+    for event, which in due:
+        groups.setdefault(which, []).append(event)
+
+    blocks = []
+    # "hour" trước (gấp nhất), rồi D-1, D-2, D-3
+    for which in sorted(groups, key=lambda w: -1 if w == "hour" else w):
+        prefix = "⏰ Còn 1 tiếng nữa!" if which == "hour" else f"🔔 Còn {which} ngày nữa!"
+        for i, event in enumerate(sorted(groups[which], key=lambda e: e.start_utc)):
+            start_str = event.start_local.strftime("%d-%m-%Y %H:%M")
+            url = event.url or ""
+            head = f"{prefix}\n" if i == 0 else ""
+            blocks.append(f"{head}**{event.summary}**\n🗓️ Bắt đầu: {start_str}\n🔗 {url}")
+    return blocks
+
+
+async def send_reminders(fire_ts: float, reminders: list[Reminder]):
+    """
+    Callback của reminder_engine: mỗi guild nhận 1 digest gồm các nhắc nhở
+    cùng thời điểm của những event được định tuyến tới guild đó.
+    """
+    store.delete_reminders(job_ids=[_reminder_job_id(uid, which) for uid, which in reminders])
+    REMINDER_DELAY.observe(max(0.0, datetime.now(timezone.utc).timestamp() - fire_ts))
+
+    due = _due_reminders(reminders)
+    REMINDERS_FIRED.labels("sent").inc(len(due))
+    REMINDERS_FIRED.labels("skipped").inc(len(reminders) - len(due))
+    per_channel: dict[int, tuple[discord.TextChannel, list]] = {}
+    for event, which in due:
+        for ch in channels_for(event):
+            per_channel.setdefault(ch.id, (ch, []))[1].append((event, which))
+
+    if due and not per_channel:
+        log.warning("No announcement channel; %d reminders not sent", len(due))
+    for ch, items in per_channel.values():
+        _send_to_channels([ch], format_reminder_digest(items), f"reminder digest ({len(items)} reminders)")
+
+
+def _drop_missed_reminders(fire_ts: float, reminders: list[Reminder]):
+    REMINDERS_FIRED.labels("dropped").inc(len(reminders))
+    store.delete_reminders(job_ids=[_reminder_job_id(uid, which) for uid, which in reminders])
 
 
-def send_reminder_job(uid, which):
-    asyncio.create_task(send_reminder(uid, which))
+reminder_engine = ReminderEngine(send_reminders, REMINDER_MISFIRE_GRACE, on_drop=_drop_missed_reminders)
+
+
+def restore_reminders():
+    """
+    Khôi phục nhắc nhở từ store sau khi restart. Nhắc nhở đã lỡ được
+    reminder_engine xử lý theo REMINDER_MISFIRE_GRACE (gửi ngay hoặc bỏ).
+    """
+    rows = store.load_reminders()
+    for _job_id, uid, which, fire_ts in rows:
+        reminder_engine.add(uid, which, fire_ts)
+    log.info("Restored %d reminders in %d time slots", len(rows), reminder_engine.slot_count)
+
+
+def _meta_key(feed: Feed, key: str) -> str:
+    return f"{feed.name}:{key}"
+
+
+def warm_start() -> bool:
+    """
+    Nạp snapshot event + validator ICS của từng feed từ store.
+    Event của mỗi feed được dựng lại từ snapshot để feed trả 304 vẫn gộp được.
+    Trả về True nếu có snapshot.
+    """
+    global cache_loaded
+    records = store.load_events()
+    for rec in records:
+        ev = CTFEvent.from_record(rec, LOCAL_TZ)
+        if not ev.feeds:
+            # snapshot từ bản 1 feed
+            ev.feeds = (FEEDS[0].name,)
+        events_cache.upsert(ev)
+        for name in ev.feeds:
+            if name in FEEDS_BY_NAME:
+                FEEDS_BY_NAME[name].events.append(ev)
+    if records:
+        for feed in FEEDS:
+            for key in feed.validators:
+                feed.validators[key] = store.get_meta(_meta_key(feed, key))
+        # Snapshot trả lời được ngay nhưng coi là cũ (last_refresh_at vẫn None) -> refresh chạy nền
+        cache_loaded = True
+    log.info("Warm start: loaded %d events from %s", len(records), STATE_DB)
+    return bool(records)
 
 
 # =========================================================
 # Update loop
 # =========================================================
-async def update_calendar_events():
+@UPDATE_SECONDS.time()
+async def update_calendar_events() -> Optional[bool]:
     """
     - Crawl ICS
     - Cập nhật cache
     - Lên lịch nhắc
     - Thông báo NGAY khi có event mới
-    - Thông báo khi thay đổi giờ
+    - Thông báo tổng hợp khi event đổi giờ / tên / link / giờ kết thúc
     - Xoá cache những event đã bị xoá khỏi ICS
+    Trả về True nếu cache thay đổi, False nếu không, None nếu mọi feed lỗi.
+    Xong thì hẹn lần poll kế tiếp theo poll_interval.
     """
-    async with aiohttp.ClientSession() as session:
-        try:
-            events = await fetch_events_from_ics(session)
-        except Exception:
-            log.exception("Failed to fetch/parse ICS")
-            return
+    changed = None
+    try:
+        if feed_http is None:
+            log.warning("HTTP client not ready; update skipped")
+            return None
+        async with _update_lock:
+            # Fetch mọi feed song song (tối đa FEED_CONCURRENCY); feed lỗi giữ nguyên event lần trước
+            results = await feeds.fetch_all(FEEDS, lambda feed: fetch_events_from_ics(feed_http, feed),
+                                            FEED_CONCURRENCY)
+            for feed, res in zip(FEEDS, results):
+                if isinstance(res, CircuitOpenError):
+                    FETCH_RESULTS.labels(feed.name, "circuit_open").inc()
+                elif isinstance(res, Exception):
+                    FETCH_RESULTS.labels(feed.name, "error").inc()
+                else:
+                    FETCH_RESULTS.labels(feed.name, "unchanged" if res is None else "changed").inc()
+            changed = apply_feed_results(list(zip(FEEDS, results)))
+        return changed
+    finally:
+        _schedule_next_poll(changed)
+
+
+def apply_feed_results(results: list[tuple[Feed, object]]) -> Optional[bool]:
+    """
+    Áp kết quả fetch/push của từng feed (list event mới / None = không đổi / Exception)
+    vào cache, reminder và store. Trả về True nếu cache thay đổi, None nếu mọi feed lỗi.
+    """
+    ok = changed_feeds = 0
+    for feed, res in results:
+        if isinstance(res, CircuitOpenError):
+            log.warning("Feed %s: upstream circuit open; skipped", feed.name)
+        elif isinstance(res, Exception):
+            log.error("Failed to fetch/parse feed %s", feed.name, exc_info=res)
+        else:
+            ok += 1
+            if res is not None:
+                feed.events = res
+                changed_feeds += 1
+    if not ok:
+        return None
+
+    global last_refresh_at, cache_loaded
+    last_refresh_at = monotonic()
+    cache_loaded = True
 
     now = datetime.now(timezone.utc)
-    new_count = 0
+    LAST_UPDATE.set(now.timestamp())
+    # --- evict event đã kết thúc (chỉ duyệt phần đầu index), kể cả khi ICS không đổi ---
+    expired = events_cache.evict_ended(now)
+    store.delete_events(ev.uid for ev in expired)
+    EVENT_CHANGES.labels("expired").inc(len(expired))
+
+    if not changed_feeds:
+        log.info("Update calendar: ICS unchanged, skipped parse, %d expired", len(expired))
+        return False
+
+    # Gộp event trùng giữa các feed (UID, hoặc tiêu đề + giờ bắt đầu)
+    events = feeds.merge_events(FEEDS)
+    # So với cache theo fingerprint: phần việc dưới đây tỉ lệ với số event thay đổi
+    diff = diff_events(events_cache, events, now)
+
+    # --- event mới ---
+    for ev in diff.added:
+        events_cache.upsert(ev)
+        # send_initial_announcement(ev)  # nếu muốn thông báo ngay khi có event mới
+    to_schedule = list(diff.added)
+
+    # --- event thay đổi: chỉ lên lịch lại khi giờ bắt đầu đổi ---
+    notices: list[EventChange] = []
+    for change in diff.changed:
+        events_cache.upsert(change.new)
+        if "start_utc" in change.fields:
+            to_schedule.append(change.new)
+        if change.fields - {"feeds"}:
+            notices.append(change)
+        log.info("Event %s changed: %s", change.new.summary, ", ".join(sorted(change.fields)))
+    schedule_reminders(to_schedule)
+    if notices:
+        send_change_notice(notices)
 
-    current_uids = {ev["uid"] for ev in events}
+    # --- cleanup: xoá event không còn trong ICS ---
+    for ev in diff.removed:
+        events_cache.remove(ev.uid)
+        log.info("Removed event not in ICS anymore: %s", ev.summary)
+    remove_reminders(ev.uid for ev in diff.removed)
+
+    # --- lưu snapshot (chỉ phần thay đổi) + validator ICS ---
+    store.upsert_events([ev.to_record() for ev in diff.added] + [c.new.to_record() for c in diff.changed])
+    store.delete_events(ev.uid for ev in diff.removed)
+    store.set_meta({_meta_key(feed, k): v for feed in FEEDS for k, v in feed.validators.items()})
+    EVENT_CHANGES.labels("added").inc(len(diff.added))
+    EVENT_CHANGES.labels("changed").inc(len(diff.changed))
+    EVENT_CHANGES.labels("removed").inc(len(diff.removed))
+
+    log.info("Update calendar: %d/%d feeds changed, %d events merged, %d new, %d changed, %d removed, %d expired",
+             changed_feeds, len(FEEDS), len(events), len(diff.added), len(diff.changed),
+             len(diff.removed), len(expired))
+    return bool(diff)
+
+
+def _schedule_next_poll(changed: Optional[bool]) -> None:
+    """Hẹn lần poll kế tiếp (job "periodic-update" 1 lần, thay job cũ nếu có)."""
+    if not scheduler.running:
+        return
+    delay = poll_interval.next(changed)
+    NEXT_POLL.set(delay)
+    scheduler.add_job(periodic_refresh, "date", run_date=datetime.now(LOCAL_TZ) + timedelta(seconds=delay),
+                      id="periodic-update", replace_existing=True)
+    log.info("Next ICS poll in %.0fs", delay)
 
-    # --- xử lý event mới hoặc update ---
-    for ev in events:
-        if ev["start_utc"] <= now:
-            continue
 
-        uid = ev["uid"]
-        if uid not in events_cache:
-            # Event mới
-            events_cache[uid] = ev
-            schedule_event_reminders(ev)
-            # await send_initial_announcement(ev)  # nếu muốn thông báo ngay khi có event mới
-            new_count += 1
-        else:
-            # Đã có -> kiểm tra thay đổi giờ
-            cached = events_cache[uid]
-            if cached["start_utc"] != ev["start_utc"]:
-                old_start = cached["start_utc"]
-                events_cache[uid] = ev
-                # Remove jobs cũ
-                for jid in [f"{uid}-remind-day-{i}" for i in range(1, 4)] + [f"{uid}-remind-hour"]:
-                    job = scheduler.get_job(jid)
-                    if job:
-                        job.remove()
-                # Lên lịch lại
-                schedule_event_reminders(ev)
-                log.info("Updated schedule for event %s (start changed)", ev["summary"])
-                # Thông báo thay đổi giờ
-                await send_update_announcement(ev, old_start)
+def request_refresh() -> asyncio.Task:
+    """
+    Single-flight: nếu đang có refresh chạy thì trả về chính task đó,
+    ngược lại tạo task update_calendar_events() mới.
+    Người gọi muốn chờ thì nên await asyncio.shield(...) để không huỷ task chung.
+    """
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(update_calendar_events())
+    return _refresh_task
 
-    # --- cleanup: xoá event không còn trong ICS ---
-    to_remove = [uid for uid in list(events_cache.keys()) if uid not in current_uids]
-    for uid in to_remove:
-        removed = events_cache.pop(uid)
-        log.info("Removed event not in ICS anymore: %s", removed["summary"])
-        # xoá reminder jobs liên quan
-        for jid in [f"{uid}-remind-day-{i}" for i in range(1, 4)] + [f"{uid}-remind-hour"]:
-            job = scheduler.get_job(jid)
-            if job:
-                job.remove()
-
-    log.info("Update calendar: scanned %d events, %d new scheduled, %d removed",
-             len(events), new_count, len(to_remove))
+
+def cache_is_stale() -> bool:
+    return last_refresh_at is None or monotonic() - last_refresh_at > CACHE_FRESHNESS
+
+
+async def periodic_refresh():
+    await asyncio.shield(request_refresh())
 
 # =========================================================
 # Discord lifecycle
 # =========================================================
-async def _resolve_announcement_channel() -> None:
+def _resolve_guild_channel(guild: discord.Guild) -> Optional[discord.TextChannel]:
     """
-    Cố gắng tìm kênh để post announce theo thứ tự:
-    1) ANNOUNCE_CHANNEL_ID (nếu set)
-    2) Channel theo CATEGORY_NAME + CHANNEL_NAME
-    3) Bất kỳ channel nào trùng tên CHANNEL_NAME
+    Tìm kênh post announce của 1 guild theo thứ tự:
+    1) channel_id trong FEEDS_FILE, hoặc ANNOUNCE_CHANNEL_ID (nếu thuộc guild này)
+    2) Channel theo category + name (FEEDS_FILE, mặc định CATEGORY_NAME + CHANNEL_NAME)
+    3) Bất kỳ channel nào trùng tên
     4) Fallback: kênh text đầu tiên mà bot có quyền gửi
+       (chỉ với guild được feed chỉ định rõ, hoặc khi bot chỉ ở 1 guild)
     """
-    global announcement_channel
+    cfg = GUILD_CONFIGS.get(guild.id, {})
+    category_name = cfg.get("category", CATEGORY_NAME)
+    channel_name = cfg.get("channel", CHANNEL_NAME)
 
     # 1) Theo ID
-    if ANNOUNCE_CHANNEL_ID:
-        ch = client.get_channel(ANNOUNCE_CHANNEL_ID)
-        if isinstance(ch, discord.TextChannel):
-            announcement_channel = ch
-            log.info("Announcement channel resolved by ID: #%s (%s)", ch.name, ch.guild.name)
-            return
+    for channel_id in (cfg.get("channel_id"), ANNOUNCE_CHANNEL_ID):
+        if channel_id:
+            ch = guild.get_channel(int(channel_id))
+            if isinstance(ch, discord.TextChannel):
+                log.info("Announcement channel resolved by ID: #%s (%s)", ch.name, guild.name)
+                return ch
 
     # 2) Theo category + name
-    for guild in client.guilds:
-        cat = discord.utils.get(guild.categories, name=CATEGORY_NAME)
-        if cat:
-            ch = discord.utils.get(cat.text_channels, name=CHANNEL_NAME)
-            if ch:
-                announcement_channel = ch
-                log.info("Announcement channel resolved by category/name: #%s (%s)", ch.name, guild.name)
-                return
+    cat = discord.utils.get(guild.categories, name=category_name)
+    if cat:
+        ch = discord.utils.get(cat.text_channels, name=channel_name)
+        if ch:
+            log.info("Announcement channel resolved by category/name: #%s (%s)", ch.name, guild.name)
+            return ch
 
     # 3) Bất kỳ channel tên khớp
-    for guild in client.guilds:
-        ch = discord.utils.get(guild.text_channels, name=CHANNEL_NAME)
-        if ch:
-            announcement_channel = ch
-            log.info("Announcement channel resolved by name: #%s (%s)", ch.name, guild.name)
-            return
+    ch = discord.utils.get(guild.text_channels, name=channel_name)
+    if ch:
+        log.info("Announcement channel resolved by name: #%s (%s)", ch.name, guild.name)
+        return ch
 
     # 4) Fallback: kênh đầu có quyền gửi
-    for guild in client.guilds:
+    if guild.id in _ROUTED_GUILDS or len(client.guilds) == 1:
         for ch in guild.text_channels:
             perms = ch.permissions_for(guild.me)
             if perms.send_messages:
-                announcement_channel = ch
                 log.warning("Announcement channel fallback to #%s (%s)", ch.name, guild.name)
-                return
+                return ch
 
-    log.warning("Could not resolve any announcement channel.")
+    log.warning("Could not resolve announcement channel for guild %s", guild.name)
+    return None
+
+
+async def _resolve_announcement_channels() -> None:
+    announcement_channels.clear()
+    if _PINNED_CHANNEL_ONLY:
+        ch = client.get_channel(ANNOUNCE_CHANNEL_ID)
+        if isinstance(ch, discord.TextChannel):
+            announcement_channels[ch.guild.id] = ch
+            log.info("Announcement channel resolved by ID: #%s (%s)", ch.name, ch.guild.name)
+            return
+        log.warning("ANNOUNCE_CHANNEL_ID %d not found; resolving per guild", ANNOUNCE_CHANNEL_ID)
+    for guild in client.guilds:
+        ch = _resolve_guild_channel(guild)
+        if ch:
+            announcement_channels[guild.id] = ch
+    if not announcement_channels:
+        log.warning("Could not resolve any announcement channel.")
+
+
+@client.event
+async def on_guild_join(guild: discord.Guild):
+    if _PINNED_CHANNEL_ONLY and announcement_channels:
+        return  # đã có kênh cố định theo ANNOUNCE_CHANNEL_ID
+    ch = _resolve_guild_channel(guild)
+    if ch:
+        announcement_channels[guild.id] = ch
+
+
+@client.event
+async def on_guild_remove(guild: discord.Guild):
+    announcement_channels.pop(guild.id, None)
 
 
 @client.event
 async def on_ready():
     log.info("Bot online: %s", client.user)
 
-    await _resolve_announcement_channel()
+    await _resolve_announcement_channels()
+
+    global feed_http
+    if feed_http is None:
+        feed_http = FeedClient(
+            total_timeout=HTTP_TIMEOUT,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            retries=HTTP_RETRIES,
+            backoff_base=HTTP_BACKOFF_BASE,
+            backoff_max=HTTP_BACKOFF_MAX,
+            pool_size=max(10, FEED_CONCURRENCY),
+            circuit_failures=CIRCUIT_FAILURES,
+            circuit_reset=CIRCUIT_RESET,
+        )
+        await feed_http.start()
+
+    global parse_pool
+    if parse_pool is None and ICS_PARSE_MODE != "inline":
+        if ICS_PARSE_MODE == "process":
+            parse_pool = ProcessPoolExecutor(max_workers=ICS_PARSE_WORKERS)
+        else:
+            parse_pool = ThreadPoolExecutor(max_workers=ICS_PARSE_WORKERS, thread_name_prefix="ics-parse")
+
+    # on_ready có thể chạy lại khi reconnect gateway -> chỉ khởi động 1 lần
+    if scheduler.running:
+        return
 
     # Start scheduler
     scheduler.start()
-
-    # Initial load
-    await update_calendar_events()
-    # Poll ICS mỗi 10 phút (nhanh hơn để “bắt” event mới)
-    scheduler.add_job(lambda: asyncio.create_task(update_calendar_events()),
-                      "interval", minutes=10, id="periodic-update")
+    reminder_engine.start()
+    loop_lag.start()
+    await start_local_http_server()
+
+    # Warm start từ SQLite: có snapshot thì phục vụ ngay, đối chiếu với ICS ở nền.
+    # Mỗi lần update xong tự hẹn lần poll kế tiếp (poll thích ứng, xem polling.py)
+    if warm_start():
+        restore_reminders()
+        request_refresh()
+    else:
+        await asyncio.shield(request_refresh())
 
     # Sync slash commands
     await tree.sync()
     log.info("Slash commands synced")
 
+def _authorized(request: web.Request) -> bool:
+    # So sánh bytes: compare_digest trên str ném TypeError nếu header có ký tự non-ASCII
+    return hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8", "surrogateescape"),
+                               f"Bearer {PUSH_TOKEN}".encode())
+
+
+async def handle_refresh(request: web.Request) -> web.Response:
+    """POST /refresh: poll mọi feed ngay (dùng chung refresh đang chạy nếu có)."""
+    if not _authorized(request):
+        PUSHES.labels("refresh", "unauthorized").inc()
+        return web.json_response({"error": "unauthorized"}, status=401)
+    changed = await asyncio.shield(request_refresh())
+    PUSHES.labels("refresh", "ok" if changed is not None else "failed").inc()
+    return web.json_response({"changed": changed}, status=200 if changed is not None else 502)
+
+
+async def handle_push_ics(request: web.Request) -> web.Response:
+    """
+    POST /feeds/{name}/ics với body là file ICS: nạp ngay như vừa poll được,
+    không cần chờ tới lần poll kế tiếp. Poll sau đó (304 / cùng hash) giữ nguyên kết quả này.
+    """
+    if not _authorized(request):
+        PUSHES.labels("ics", "unauthorized").inc()
+        return web.json_response({"error": "unauthorized"}, status=401)
+    feed = FEEDS_BY_NAME.get(request.match_info["name"])
+    if feed is None:
+        PUSHES.labels("ics", "unknown_feed").inc()
+        return web.json_response({"error": "unknown feed"}, status=404)
+    try:
+        path, body_hash = await _spool_stream(request.content, PUSH_MAX_BYTES)
+    except ValueError as e:
+        PUSHES.labels("ics", "too_large").inc()
+        return web.json_response({"error": str(e)}, status=413)
+
+    async with _update_lock:
+        if body_hash == feed.validators["body_hash"]:
+            os.remove(path)
+            res = None
+        else:
+            try:
+                res = await _load_spooled_ics(feed, path, body_hash, datetime.now(timezone.utc).timestamp())
+            except Exception as e:
+                PUSHES.labels("ics", "parse_error").inc()
+                log.warning("Pushed ICS for feed %s rejected: %s", feed.name, e)
+                return web.json_response({"error": f"parse failed: {e}"}, status=400)
+        changed = apply_feed_results([(feed, res)])
+    _schedule_next_poll(changed)
+    PUSHES.labels("ics", "ok").inc()
+    log.info("Ingested pushed ICS for feed %s (%s)", feed.name, "changed" if changed else "unchanged")
+    return web.json_response({"feed": feed.name, "events": len(feed.events), "changed": changed})
+
+
+async def start_local_http_server():
+    """
+    HTTP local tại LOCAL_HTTP_HOST:LOCAL_HTTP_PORT (port 0 -> tắt):
+      GET  /metrics           : metrics format Prometheus
+      POST /refresh           : poll ngay          (cần PUSH_TOKEN)
+      POST /feeds/{name}/ics  : đẩy thẳng body ICS (cần PUSH_TOKEN)
+    """
+    global http_runner
+    if not LOCAL_HTTP_PORT or http_runner is not None:
+        return
+    app = metrics.make_app()
+    if PUSH_TOKEN:
+        app.router.add_post("/refresh", handle_refresh)
+        app.router.add_post("/feeds/{name}/ics", handle_push_ics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, LOCAL_HTTP_HOST, LOCAL_HTTP_PORT).start()
+    except OSError:
+        await runner.cleanup()
+        log.exception("Cannot bind local HTTP endpoint on %s:%d", LOCAL_HTTP_HOST, LOCAL_HTTP_PORT)
+        return
+    http_runner = runner
+    log.info("Local HTTP endpoint on http://%s:%d (push %s)", LOCAL_HTTP_HOST, LOCAL_HTTP_PORT,
+             "enabled" if PUSH_TOKEN else "disabled")
+
 # =========================================================
 # Slash command
 # =========================================================
 @tree.command(name="upcoming_event", description="Liệt kê các CTF sắp tới theo Google Calendar")
 async def upcoming_event(interaction: discord.Interaction):
-    await update_calendar_events()
-
-    now = datetime.now(timezone.utc)
-    upcoming = [ev for ev in events_cache.values() if ev["start_utc"] > now]
+    # Trả lời ngay từ cache (stale-while-revalidate); chỉ refresh nền khi cache đã cũ
+    if not cache_loaded:
+        # Chưa có snapshot và chưa từng load được ICS -> defer rồi chờ refresh đang chạy (hoặc tạo mới)
+        await interaction.response.defer(thinking=True)
+        await asyncio.shield(request_refresh())
+        send = interaction.followup.send
+    else:
+        if cache_is_stale():
+            request_refresh()
+        send = interaction.response.send_message
+
+    # Chỉ liệt kê event của các feed được định tuyến tới guild này
+    upcoming = list(islice(
+        (ev for ev in events_cache.iter_upcoming(datetime.now(timezone.utc)) if routed_to(ev, interaction.guild_id)),
+        10,
+    ))
     if not upcoming:
-        await interaction.response.send_message("❌ Không có sự kiện sắp tới.")
+        await send("❌ Không có sự kiện sắp tới.")
         return
 
-    upcoming.sort(key=lambda e: e["start_utc"])
-    blocks = [format_event_block(ev) for ev in upcoming[:10]]
-    await interaction.response.send_message("# 📅 Các sự kiện CTF sắp tới:\n\n" + "\n\n".join(blocks))
+    blocks = [format_event_block(ev) for ev in upcoming]
+    await send("# 📅 Các sự kiện CTF sắp tới:\n\n" + "\n\n".join(blocks))
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+def format_bot_stats() -> str:
+    since = "-" if last_refresh_at is None else f"{monotonic() - last_refresh_at:.0f}s trước"
+    fetch_lines = [
+        f"• `{feed.name}`: lần cuối {_ms(FETCH_SECONDS.labels(feed.name).last)}, "
+        f"TB {_ms(FETCH_SECONDS.labels(feed.name).mean)}"
+        for feed in FEEDS
+    ]
+    return "\n".join([
+        "# 📊 Trạng thái bot",
+        f"🗂️ Event trong cache: {len(events_cache)}",
+        f"⏰ Nhắc nhở chờ: {len(reminder_engine)} ({reminder_engine.slot_count} mốc thời gian)",
+        f"🔄 Đồng bộ lần cuối: {since}, mất {_ms(UPDATE_SECONDS.last)} (TB {_ms(UPDATE_SECONDS.mean)})",
+        f"🧩 Parse ICS lần cuối: {_ms(PARSE_SECONDS.last)}",
+        "🌐 Fetch:",
+        *fetch_lines,
+        f"📨 Hàng đợi gửi: {dispatcher.depth()} tin, đã gửi {dispatcher.sent}, bỏ {dispatcher.dropped}",
+        f"⏱️ Lag event loop: max 1 phút gần nhất {_ms(LOOP_LAG_MAX.value)}, max từ lúc chạy {_ms(LOOP_LAG.max)}",
+        f"💓 Gateway latency: {_ms(GATEWAY_LATENCY.value)}",
+    ])
+
+
+@tree.command(name="bot_stats", description="(Admin) Số liệu vận hành của bot CTF")
+@app_commands.default_permissions(administrator=True)
+async def bot_stats(interaction: discord.Interaction):
+    await interaction.response.send_message(format_bot_stats(), ephemeral=True)
 
 
 # =========================================================
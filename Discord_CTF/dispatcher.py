@@ -0,0 +1,183 @@
+# dispatcher.py
+"""
+Hàng đợi gửi tin ra Discord theo từng kênh:
+- Mỗi kênh 1 hàng đợi + 1 worker (chỉ chạy khi hàng đợi có tin)
+- Gộp các tin liên tiếp đang chờ thành 1 tin, miễn không vượt 2000 ký tự
+- Token bucket theo kênh (mặc định 5 tin / 5 giây) để không chạm rate limit của Discord
+- Lỗi tạm thời (429, 5xx, mất mạng) -> retry với backoff; lỗi quyền / kênh mất -> bỏ
+"""
+import asyncio
+import logging
+import random
+from collections import deque
+from time import monotonic
+from typing import Optional
+
+import aiohttp
+import discord
+
+from metrics import Counter, Histogram
+
+log = logging.getLogger("ctf-bot.dispatch")
+
+SEND_SECONDS = Histogram("ctf_discord_send_seconds", "Latency of channel.send calls")
+SENDS = Counter("ctf_discord_sends_total", "Discord send attempts by result", ("result",))
+QUEUED_MESSAGES = Counter("ctf_outbound_messages_total", "Messages submitted to the outbound queue")
+
+MAX_MESSAGE_LEN = 2000
+SEPARATOR = "\n\n"
+
+
+def split_message(text: str, max_len: int = MAX_MESSAGE_LEN) -> list[str]:
+    """Tách tin dài theo ranh giới dòng; dòng đơn quá dài thì cắt cứng."""
+    if len(text) <= max_len:
+        return [text]
+    parts: list[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > max_len:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:max_len])
+            line = line[max_len:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= max_len:
+            current += "\n" + line
+        else:
+            parts.append(current)
+            current = line
+    if current:
+        parts.append(current)
+    return parts
+
+
+class TokenBucket:
+    def __init__(self, rate: int, per: float):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = monotonic()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+
+class _ChannelQueue:
+    __slots__ = ("channel", "pending", "bucket", "worker")
+
+    def __init__(self, channel, bucket: TokenBucket):
+        self.channel = channel
+        self.pending: deque[str] = deque()
+        self.bucket = bucket
+        self.worker: Optional[asyncio.Task] = None
+
+
+class OutboundDispatcher:
+    def __init__(self, rate: int = 5, per: float = 5.0, max_retries: int = 4,
+                 max_len: int = MAX_MESSAGE_LEN, warn_depth: int = 50):
+        self.rate = rate
+        self.per = per
+        self.max_retries = max_retries
+        self.max_len = max_len
+        self.warn_depth = warn_depth
+        self._queues: dict[int, _ChannelQueue] = {}
+        self.sent = 0       # số tin Discord thực sự gửi
+        self.submitted = 0  # số tin được đưa vào hàng đợi
+        self.dropped = 0
+
+    # ---------- trạng thái ----------
+    def depth(self, channel_id: Optional[int] = None) -> int:
+        if channel_id is not None:
+            q = self._queues.get(channel_id)
+            return len(q.pending) if q else 0
+        return sum(len(q.pending) for q in self._queues.values())
+
+    def depths(self) -> dict[int, int]:
+        return {cid: len(q.pending) for cid, q in self._queues.items() if q.pending}
+
+    # ---------- gửi ----------
+    def submit(self, channel, text: str) -> None:
+        """Đưa tin vào hàng đợi của kênh (không chờ gửi xong)."""
+        q = self._queues.get(channel.id)
+        if q is None:
+            q = self._queues[channel.id] = _ChannelQueue(channel, TokenBucket(self.rate, self.per))
+        q.channel = channel
+        parts = split_message(text, self.max_len)
+        q.pending.extend(parts)
+        self.submitted += len(parts)
+        QUEUED_MESSAGES.inc(len(parts))
+        if len(q.pending) >= self.warn_depth:
+            log.warning("Outbound queue for #%s is %d messages deep", getattr(channel, "name", channel.id), len(q.pending))
+        if q.worker is None or q.worker.done():
+            q.worker = asyncio.create_task(self._drain(q), name=f"dispatch-{channel.id}")
+
+    def _take_batch(self, q: _ChannelQueue) -> tuple[str, int]:
+        text = q.pending.popleft()
+        count = 1
+        while q.pending and len(text) + len(SEPARATOR) + len(q.pending[0]) <= self.max_len:
+            text += SEPARATOR + q.pending.popleft()
+            count += 1
+        return text, count
+
+    async def _drain(self, q: _ChannelQueue) -> None:
+        while q.pending:
+            await q.bucket.acquire()
+            text, count = self._take_batch(q)
+            if await self._send_with_retry(q.channel, text):
+                self.sent += 1
+                if count > 1:
+                    log.info("Coalesced %d queued messages into 1 for #%s", count, getattr(q.channel, "name", q.channel.id))
+            else:
+                self.dropped += count
+
+    async def _send_with_retry(self, channel, text: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with SEND_SECONDS.time():
+                    await channel.send(text)
+                SENDS.labels("ok").inc()
+                return True
+            except (discord.Forbidden, discord.NotFound):
+                SENDS.labels("dropped").inc()
+                log.exception("Cannot send to #%s; message dropped", getattr(channel, "name", channel.id))
+                return False
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    SENDS.labels("dropped").inc()
+                    log.exception("Discord rejected message for #%s; dropped", getattr(channel, "name", channel.id))
+                    return False
+                err = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                err = e
+            SENDS.labels("retry" if attempt < self.max_retries else "failed").inc()
+            if attempt == self.max_retries:
+                break
+            delay = min(30.0, 2 ** attempt) + random.uniform(0, 1)
+            log.warning("Send to #%s failed (%r), retry %d/%d in %.1fs",
+                        getattr(channel, "name", channel.id), err, attempt + 1, self.max_retries, delay)
+            await asyncio.sleep(delay)
+        log.error("Giving up sending to #%s after %d retries", getattr(channel, "name", channel.id), self.max_retries)
+        return False
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Chờ các hàng đợi gửi hết (tối đa `timeout` giây) rồi huỷ worker còn lại."""
+        workers = [q.worker for q in self._queues.values() if q.worker and not q.worker.done()]
+        if not workers:
+            return
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            log.warning("Dispatcher closed with %d messages unsent", self.depth())
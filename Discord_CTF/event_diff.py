@@ -0,0 +1,70 @@
+# event_diff.py
+"""
+So sánh danh sách event mới (sau merge) với cache theo từng trường:
+- Mỗi CTFEvent có sẵn fingerprint (hash summary/start/end/url) tính 1 lần khi dựng
+- diff_events() -> EventDiff: added / removed / changed (kèm tập trường đổi)
+Event không đổi chỉ tốn 1 lần tra dict + so 2 số nguyên; mọi việc nặng
+(reminder, store, thông báo) chỉ chạy trên phần thay đổi.
+"""
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+from event_index import CTFEvent, EventIndex
+
+# Trường nội dung được so khi fingerprint khác nhau
+FIELDS = ("summary", "start_utc", "end_utc", "url")
+
+
+class EventChange(NamedTuple):
+    old: CTFEvent
+    new: CTFEvent
+    fields: frozenset[str]  # tập con của FIELDS + "feeds"
+
+
+class EventDiff:
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self):
+        self.added: list[CTFEvent] = []
+        self.removed: list[CTFEvent] = []
+        self.changed: list[EventChange] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self) -> str:
+        return f"EventDiff(+{len(self.added)} -{len(self.removed)} ~{len(self.changed)})"
+
+
+def changed_fields(old: CTFEvent, new: CTFEvent) -> frozenset[str]:
+    fields = set()
+    if old.fingerprint != new.fingerprint:
+        fields.update(f for f in FIELDS if getattr(old, f) != getattr(new, f))
+    if old.feeds != new.feeds:
+        fields.add("feeds")
+    return frozenset(fields)
+
+
+def diff_events(index: EventIndex, events: Iterable[CTFEvent], now: datetime) -> EventDiff:
+    """
+    - added  : event chưa có trong cache và chưa bắt đầu
+    - changed: event đã có trong cache nhưng khác ít nhất 1 trường
+    - removed: event trong cache không còn trong `events`
+    Event mới đã bắt đầu bị bỏ qua (giống trước: không lên lịch / không cache).
+    """
+    diff = EventDiff()
+    seen = set()
+    for ev in events:
+        seen.add(ev.uid)
+        cached = index.get(ev.uid)
+        if cached is None:
+            if ev.start_utc > now:
+                diff.added.append(ev)
+        elif cached.fingerprint != ev.fingerprint or cached.feeds != ev.feeds:
+            fields = changed_fields(cached, ev)
+            if fields:
+                diff.changed.append(EventChange(cached, ev, fields))
+
+    for uid in index.uids() - seen:
+        diff.removed.append(index.get(uid))
+    return diff
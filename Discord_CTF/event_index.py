@@ -0,0 +1,128 @@
+# event_index.py
+"""
+Cache event CTF sắp xếp theo thời gian bắt đầu:
+- CTFEvent: bản ghi gọn dùng __slots__ (thay cho dict 7 khoá), kèm fingerprint nội dung
+- EventIndex: uid -> event + SortedList (start_ts, uid)
+    upsert / remove theo uid : O(log n)
+    upcoming(now, k)        : O(log n + k)
+    evict_ended(now)        : chỉ duyệt các event đã bắt đầu
+"""
+from datetime import datetime, timezone, tzinfo
+from itertools import islice
+from typing import Iterator, Optional
+
+from sortedcontainers import SortedList
+
+from ics_parser import EventRecord
+
+
+class CTFEvent:
+    __slots__ = ("uid", "summary", "start_utc", "end_utc", "start_local", "end_local", "url", "feeds",
+                 "fingerprint")
+
+    def __init__(self, uid: str, summary: str, start_utc: datetime, end_utc: Optional[datetime],
+                 local_tz: tzinfo, url: Optional[str] = None, feeds: tuple[str, ...] = ()):
+        self.uid = uid
+        self.summary = summary
+        self.start_utc = start_utc
+        self.end_utc = end_utc
+        self.start_local = start_utc.astimezone(local_tz)
+        self.end_local = end_utc.astimezone(local_tz) if end_utc else None
+        self.url = url
+        self.feeds = feeds
+        # hash các trường hiển thị; khác nhau -> có trường đổi (feeds so riêng vì chỉ ảnh hưởng định tuyến)
+        self.fingerprint = hash((summary, start_utc, end_utc, url))
+
+    @classmethod
+    def from_record(cls, rec: EventRecord, local_tz: tzinfo) -> "CTFEvent":
+        return cls(
+            rec.uid,
+            rec.summary,
+            datetime.fromtimestamp(rec.start_ts, timezone.utc),
+            datetime.fromtimestamp(rec.end_ts, timezone.utc) if rec.end_ts is not None else None,
+            local_tz,
+            rec.url,
+            tuple(rec.feeds),
+        )
+
+    def with_feeds(self, feeds: tuple[str, ...]) -> "CTFEvent":
+        """Bản sao với tập feed khác (không sửa object đang nằm trong cache)."""
+        ev = object.__new__(CTFEvent)
+        for name in CTFEvent.__slots__:
+            setattr(ev, name, getattr(self, name))
+        ev.feeds = feeds
+        return ev
+
+    def to_record(self) -> EventRecord:
+        return EventRecord(self.uid, self.summary, self.start_utc.timestamp(),
+                           self.end_utc.timestamp() if self.end_utc else None, self.url, self.feeds)
+
+    @property
+    def sort_key(self) -> tuple[float, str]:
+        return self.start_utc.timestamp(), self.uid
+
+    def ended(self, now: datetime) -> bool:
+        return (self.end_utc or self.start_utc) < now
+
+    def __repr__(self) -> str:
+        return f"CTFEvent({self.uid!r}, {self.summary!r}, {self.start_utc.isoformat()})"
+
+
+class EventIndex:
+    def __init__(self):
+        self._by_uid: dict[str, CTFEvent] = {}
+        self._order: SortedList = SortedList()  # (start_ts, uid)
+
+    def __len__(self) -> int:
+        return len(self._by_uid)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._by_uid
+
+    def __iter__(self) -> Iterator[CTFEvent]:
+        """Duyệt event theo thứ tự thời gian bắt đầu."""
+        for _, uid in self._order:
+            yield self._by_uid[uid]
+
+    def get(self, uid: str) -> Optional[CTFEvent]:
+        return self._by_uid.get(uid)
+
+    def uids(self):
+        return self._by_uid.keys()
+
+    def upsert(self, ev: CTFEvent) -> Optional[CTFEvent]:
+        """Thêm hoặc thay event cùng uid. Trả về bản cũ (nếu có)."""
+        old = self._by_uid.get(ev.uid)
+        if old is not None:
+            self._order.remove(old.sort_key)
+        self._by_uid[ev.uid] = ev
+        self._order.add(ev.sort_key)
+        return old
+
+    def remove(self, uid: str) -> Optional[CTFEvent]:
+        ev = self._by_uid.pop(uid, None)
+        if ev is not None:
+            self._order.remove(ev.sort_key)
+        return ev
+
+    def iter_upcoming(self, now: datetime) -> Iterator[CTFEvent]:
+        """Duyệt lười các event có start_utc > now theo thứ tự bắt đầu."""
+        pos = self._order.bisect_right((now.timestamp(), "\U0010ffff"))
+        for _, uid in self._order.islice(pos):
+            yield self._by_uid[uid]
+
+    def upcoming(self, now: datetime, limit: Optional[int] = None) -> list[CTFEvent]:
+        """Các event có start_utc > now, theo thứ tự bắt đầu, tối đa `limit` event."""
+        return list(islice(self.iter_upcoming(now), limit))
+
+    def evict_ended(self, now: datetime) -> list[CTFEvent]:
+        """
+        Xoá các event đã kết thúc. Chỉ cần duyệt phần đầu (event đã bắt đầu),
+        vì event chưa bắt đầu thì chắc chắn chưa kết thúc.
+        """
+        stop = self._order.bisect_right((now.timestamp(), "\U0010ffff"))
+        ended = [self._by_uid[uid] for _, uid in self._order.islice(0, stop)
+                 if self._by_uid[uid].ended(now)]
+        for ev in ended:
+            self.remove(ev.uid)
+        return ended
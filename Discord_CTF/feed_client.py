@@ -0,0 +1,188 @@
+# feed_client.py
+"""
+HTTP client dùng chung cho việc poll ICS:
+- Một ClientSession sống suốt vòng đời bot (connection pool + keep-alive + DNS cache)
+- Timeout cho từng request
+- Retry với exponential backoff có jitter cho lỗi tạm thời (timeout, lỗi kết nối, 429, 5xx)
+- Circuit breaker theo từng host: upstream lỗi liên tục thì ngừng gọi host đó một thời gian
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import aiohttp
+from yarl import URL
+
+log = logging.getLogger("ctf-bot.http")
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Circuit đang mở: upstream bị coi là down, request bị từ chối ngay."""
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed    -> cho qua mọi request
+    open      -> từ chối tới khi hết reset_timeout
+    half-open -> cho đúng 1 request thử; thành công thì đóng, thất bại thì mở lại
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                log.warning("Circuit opened after %d consecutive failures", self.failures)
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Request thử kết thúc bằng lỗi không liên quan tới sức khoẻ upstream (vd. 404)."""
+        self._probing = False
+
+
+async def read_body(resp: aiohttp.ClientResponse) -> bytes:
+    return await resp.read()
+
+
+class FeedClient:
+    def __init__(
+        self,
+        *,
+        total_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        pool_size: int = 10,
+        keepalive_timeout: float = 120.0,
+        circuit_failures: int = 5,
+        circuit_reset: float = 300.0,
+    ):
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.circuit_failures = circuit_failures
+        self.circuit_reset = circuit_reset
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            ttl_dns_cache=300,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """1 circuit breaker cho mỗi host, để 1 nguồn hỏng không chặn các nguồn khác."""
+        host = URL(url).host or ""
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(self.circuit_failures, self.circuit_reset)
+        return breaker
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": random trong [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Optional[dict] = None,
+        consume: Callable[[aiohttp.ClientResponse], Awaitable[T]] = read_body,
+    ) -> T:
+        """
+        GET url, gọi consume(resp) bên trong context của response và trả về kết quả.
+        - 2xx/304 được chuyển cho consume (consume phải làm lại được từ đầu khi retry)
+        - 408/429/5xx, timeout, lỗi kết nối -> retry với backoff
+        - 4xx khác -> raise ClientResponseError ngay, không retry
+        """
+        breaker = self.breaker_for(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {url}")
+        await self.start()
+
+        attempt = 0
+        while True:
+            try:
+                async with self.session.get(url, headers=headers) as resp:
+                    if resp.status in RETRY_STATUSES:
+                        retry_after = resp.headers.get("Retry-After")
+                        raise RetryableStatusError(
+                            resp.status,
+                            float(retry_after) if retry_after and retry_after.isdigit() else None,
+                        )
+                    if resp.status != 304:
+                        resp.raise_for_status()
+                    result = await consume(resp)
+            except (RetryableStatusError, aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                if isinstance(e, RetryableStatusError) and e.retry_after is not None:
+                    delay = min(self.backoff_max, max(delay, e.retry_after))
+                log.warning("GET %s failed (%r), retry %d/%d in %.1fs",
+                            url, e, attempt + 1, self.retries, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return result
@@ -0,0 +1,112 @@
+# feeds.py
+"""
+Nhiều nguồn ICS + định tuyến theo guild:
+- Feed: 1 calendar (url, các guild nhận thông báo, validator conditional GET, event lần parse gần nhất)
+- load_feeds(): đọc FEEDS_FILE (JSON); không có file -> 1 feed "default" từ CALENDAR_ICS_URL
+- fetch_all(): fetch mọi feed song song, giới hạn bằng Semaphore
+- merge_events(): gộp event trùng giữa các feed theo UID, rồi theo (tiêu đề chuẩn hoá, giờ bắt đầu)
+
+Ví dụ feeds.json:
+{
+  "feeds": [
+    {"name": "team",    "url": "https://calendar.google.com/.../basic.ics", "guilds": [111, 222]},
+    {"name": "ctftime", "url": "https://ctftime.org/event/list/upcoming/ics", "guilds": [111]}
+  ],
+  "guilds": {
+    "111": {"channel_id": 1234567890},
+    "222": {"category": "CTF", "channel": "announcement"}
+  }
+}
+"guilds" của feed bỏ trống -> gửi tới mọi guild có kênh khớp cấu hình mặc định.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, Iterable, Optional
+
+from event_index import CTFEvent
+
+
+class Feed:
+    def __init__(self, name: str, url: str, guild_ids: Optional[Iterable[int]] = None):
+        self.name = name
+        self.url = url
+        # None = mọi guild
+        self.guild_ids: Optional[frozenset[int]] = frozenset(int(g) for g in guild_ids) if guild_ids else None
+        # validator của lần fetch thành công gần nhất (conditional GET + hash body)
+        # + recurring_until: mốc cuối cửa sổ bung event lặp lần parse trước (None = feed không có event lặp)
+        self.validators: dict[str, Optional[str]] = {"etag": None, "last_modified": None, "body_hash": None,
+                                                     "recurring_until": None}
+        # event (chưa kết thúc) của lần parse gần nhất, dùng lại khi feed trả 304
+        self.events: list[CTFEvent] = []
+
+    def __repr__(self) -> str:
+        return f"Feed({self.name!r}, {self.url!r})"
+
+
+def load_feeds(path: Optional[str], default_url: Optional[str]) -> tuple[list[Feed], dict[int, dict]]:
+    """
+    Trả về (feeds, guild_configs). guild_configs: guild_id -> {channel_id?, category?, channel?}
+    """
+    if not path:
+        return ([Feed("default", default_url)] if default_url else []), {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    feeds = []
+    seen = set()
+    for i, item in enumerate(data.get("feeds", [])):
+        name = str(item.get("name") or f"feed{i + 1}")
+        if name in seen:
+            raise ValueError(f"Duplicate feed name: {name}")
+        seen.add(name)
+        feeds.append(Feed(name, item["url"], item.get("guilds")))
+
+    guild_configs = {int(gid): cfg for gid, cfg in data.get("guilds", {}).items()}
+    return feeds, guild_configs
+
+
+async def fetch_all(feeds: list[Feed], fetch_one: Callable[[Feed], Awaitable], limit: int) -> list:
+    """
+    Chạy fetch_one(feed) cho mọi feed, tối đa `limit` feed cùng lúc.
+    Trả về list kết quả theo thứ tự feeds; feed lỗi -> phần tử là Exception.
+    Tổng thời gian ~ feed chậm nhất (khi limit >= số feed) thay vì tổng các feed.
+    """
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def run(feed: Feed):
+        async with sem:
+            return await fetch_one(feed)
+
+    return await asyncio.gather(*(run(feed) for feed in feeds), return_exceptions=True)
+
+
+def _title_key(ev: CTFEvent) -> tuple[str, float]:
+    return " ".join(ev.summary.casefold().split()), ev.start_utc.timestamp()
+
+
+def merge_events(feeds: list[Feed]) -> list[CTFEvent]:
+    """
+    Gộp event của mọi feed. Event trùng (cùng UID, hoặc cùng tiêu đề + giờ bắt đầu)
+    chỉ giữ bản của feed khai báo trước; ev.feeds = mọi feed chứa event đó.
+    """
+    by_uid: dict[str, CTFEvent] = {}
+    by_title: dict[tuple[str, float], CTFEvent] = {}
+    sources: dict[str, list[str]] = {}
+
+    for feed in feeds:
+        for ev in feed.events:
+            primary = by_uid.get(ev.uid) or by_title.get(_title_key(ev))
+            if primary is None:
+                primary = by_uid[ev.uid] = ev
+                by_title.setdefault(_title_key(ev), ev)
+                sources[ev.uid] = []
+            if feed.name not in sources[primary.uid]:
+                sources[primary.uid].append(feed.name)
+
+    merged = []
+    for uid, ev in by_uid.items():
+        names = tuple(sources[uid])
+        merged.append(ev if ev.feeds == names else ev.with_feeds(names))
+    merged.sort(key=lambda e: e.start_utc)
+    return merged
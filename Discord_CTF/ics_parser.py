@@ -0,0 +1,550 @@
+# ics_parser.py
+"""
+Parser ICS dạng streaming:
+- Đọc feed theo từng chunk bytes, unfold dòng theo RFC 5545
+- Tách từng VEVENT ra và parse riêng lẻ (không dựng cả cây Calendar)
+- Event đã kết thúc được loại bằng cách dò nhanh DTEND/DTSTART trên text thô,
+  không cần parse đầy đủ
+- Event lặp (RRULE/RDATE/EXDATE) được bung lười bằng generator, chỉ trong cửa sổ
+  [now, horizon]; mỗi lần xuất hiện có UID riêng "<uid>#<giờ bắt đầu gốc UTC>"
+  và có thể bị thay bởi VEVENT cùng UID có RECURRENCE-ID
+
+Module này không phụ thuộc discord / biến môi trường để có thể dùng lại
+trong benchmark và worker pool.
+"""
+import codecs
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, date, time, timedelta, timezone, tzinfo
+from typing import Iterable, Iterator, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from bs4 import BeautifulSoup
+from dateutil.rrule import rruleset, rrulestr
+from icalendar import Calendar
+
+CHUNK_SIZE = 64 * 1024
+
+# Sai số cho phép khi dò nhanh ngày kết thúc trên text thô (chưa biết TZ thật)
+_QUICK_SKIP_SLACK = timedelta(days=2)
+_DATE_PREFIX = re.compile(r"(\d{4})(\d{2})(\d{2})")
+
+# Event lặp: cửa sổ bung mặc định + trần số lần xuất hiện / event (chặn rule kiểu FREQ=MINUTELY)
+DEFAULT_HORIZON = timedelta(days=60)
+MAX_OCCURRENCES = 500
+RECURRENCE_SEP = "#"
+
+
+# =========================================================
+# URL trong description
+# =========================================================
+# Precompiled scanner cho fast path
+_BARE_URL = re.compile(r"https?://[^\s<>\"]+")
+_URL_TRAILING = ").,;\">')"
+_A_OPEN = re.compile(r"<a(?![\w:-])", re.IGNORECASE)
+_A_TAG = re.compile(r"<a(\s[^<>]*)?>", re.IGNORECASE)
+# Giá trị không quote: được chứa "=" (query string) nhưng phải kết thúc ở khoảng trắng / hết thẻ,
+# nếu không (vd. có dấu quote giữa giá trị, "href==x") -> không khớp -> _MALFORMED -> bản chậm
+_HREF_ATTR = re.compile(r"""(?:^|\s)href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`][^\s"'<>`]*)(?=\s|$))""",
+                        re.IGNORECASE)
+_TAG = re.compile(r"<[^<>]*>")
+_TRICKY_HTML = re.compile(r"<!|<\?|<script|<style|<textarea|<title")
+_MALFORMED = object()
+
+# LRU: blake2b(description) -> URL (hoặc None). Dùng chung giữa các thread parse.
+URL_CACHE_SIZE = 4096
+_url_cache: "OrderedDict[bytes, Optional[str]]" = OrderedDict()
+_url_cache_lock = threading.Lock()
+_url_cache_stats = {"hits": 0, "misses": 0, "fallbacks": 0}
+
+
+def _clean_url_slow(description: Optional[str]) -> Optional[str]:
+    """
+    Bản gốc dựng cây BeautifulSoup cho mọi description HTML.
+    Giờ chỉ dùng làm fallback cho HTML hỏng (và làm mốc trong bench/url_extract.py).
+    """
+    if not description:
+        return None
+
+    s = str(description)
+
+    # 1) Nếu có HTML -> bóc bằng BeautifulSoup
+    if "<" in s and ">" in s and ("<a" in s.lower() or "</" in s.lower()):
+        soup = BeautifulSoup(s, "html.parser")
+        a = soup.find("a", href=True)
+        if a and a["href"]:
+            return a["href"].strip()
+        # fallback: lấy text rồi regex
+        s = soup.get_text(" ", strip=True)
+
+    # 2) Regex lấy URL đầu tiên
+    m = _BARE_URL.search(s)
+    if m:
+        url = m.group(0)
+        # Loại bỏ ký tự thừa cuối chuỗi nếu có
+        url = url.rstrip(").,;\">')")
+        return url
+
+    return None
+
+
+def _fast_url(s: str) -> Optional[str]:
+    """
+    Tương đương _clean_url_slow nhưng chỉ dùng regex biên dịch sẵn.
+    Trả về _MALFORMED nếu HTML không chắc chắn bóc đúng được -> gọi bản chậm.
+    """
+    low = s.lower()
+    if not ("<" in s and ">" in s and ("<a" in low or "</" in low)):
+        m = _BARE_URL.search(s)
+        return m.group(0).rstrip(_URL_TRAILING) if m else None
+
+    # Comment / script / CDATA / dấu < > lệch nhau -> để html.parser xử lý
+    if s.count("<") != s.count(">") or _TRICKY_HTML.search(low):
+        return _MALFORMED
+
+    tags = _A_TAG.findall(s)
+    if len(tags) != len(_A_OPEN.findall(s)):
+        return _MALFORMED  # có thẻ <a chưa đóng
+    for attrs in tags:
+        if "href" not in attrs.lower():
+            continue
+        found = _HREF_ATTR.findall(attrs)
+        if len(found) != 1:
+            return _MALFORMED  # href không quote đúng / lặp href
+        href = html.unescape(next(g for g in found[0] if g)).strip() if any(found[0]) else ""
+        if href:
+            return href
+        break  # thẻ <a> đầu tiên có href rỗng -> giống bản gốc: lấy URL từ text
+
+    text = html.unescape(_TAG.sub(" ", s))
+    m = _BARE_URL.search(text)
+    return m.group(0).rstrip(_URL_TRAILING) if m else None
+
+
+def _clean_url_from_description(description: Optional[str]) -> Optional[str]:
+    """
+    Nhận vào DESCRIPTION (có thể chứa HTML hoặc text thuần),
+    trả về URL sạch nếu có, ngược lại None.
+    Kết quả được nhớ trong LRU theo hash description -> poll sau gần như miễn phí.
+    """
+    if not description:
+        return None
+
+    s = str(description)
+    key = hashlib.blake2b(s.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _url_cache_lock:
+        if key in _url_cache:
+            _url_cache.move_to_end(key)
+            _url_cache_stats["hits"] += 1
+            return _url_cache[key]
+        _url_cache_stats["misses"] += 1
+
+    url = _fast_url(s)
+    fallback = url is _MALFORMED
+    if fallback:
+        url = _clean_url_slow(s)
+
+    with _url_cache_lock:
+        _url_cache_stats["fallbacks"] += fallback
+        _url_cache[key] = url
+        if len(_url_cache) > URL_CACHE_SIZE:
+            _url_cache.popitem(last=False)
+    return url
+
+
+def url_cache_info() -> dict[str, int]:
+    """hits / misses / fallbacks (sang BeautifulSoup) / size của cache URL."""
+    with _url_cache_lock:
+        return {**_url_cache_stats, "size": len(_url_cache)}
+
+
+# =========================================================
+# Tách dòng / component
+# =========================================================
+def iter_unfolded_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Nhận các chunk bytes, trả về từng content line đã unfold
+    (dòng bắt đầu bằng space/tab là phần nối của dòng trước).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""   # phần dòng chưa gặp \n
+    current = None  # logical line đang gom (chờ xem dòng sau có phải continuation)
+
+    def feed(text: str) -> Iterator[str]:
+        nonlocal pending, current
+        pending += text
+        *lines, pending = pending.split("\n")
+        for raw in lines:
+            raw = raw.rstrip("\r")
+            if raw[:1] in (" ", "\t") and current is not None:
+                current += raw[1:]
+                continue
+            if current is not None:
+                yield current
+            current = raw
+
+    for chunk in chunks:
+        yield from feed(decoder.decode(chunk))
+    yield from feed(decoder.decode(b"", final=True) + "\n")
+    if current is not None:
+        yield current
+
+
+def iter_components(lines: Iterable[str], names: tuple[str, ...] = ("VEVENT", "VTIMEZONE")) -> Iterator[tuple[str, list[str]]]:
+    """
+    Gom các component cấp một (ngay dưới VCALENDAR) có tên trong `names`,
+    trả về (name, list dòng từ BEGIN tới END, gồm cả component con như VALARM).
+    Các dòng ngoài những component này bị bỏ qua ngay, không giữ trong bộ nhớ.
+    """
+    block: Optional[list[str]] = None
+    block_name = ""
+    depth = 0
+
+    for line in lines:
+        upper = line[:16].upper()
+        if block is None:
+            if upper.startswith("BEGIN:"):
+                name = line[6:].strip().upper()
+                if name in names:
+                    block, block_name, depth = [line], name, 1
+            continue
+
+        block.append(line)
+        if upper.startswith("BEGIN:"):
+            depth += 1
+        elif upper.startswith("END:"):
+            depth -= 1
+            if depth == 0:
+                yield block_name, block
+                block = None
+
+
+# =========================================================
+# Lọc nhanh event đã qua
+# =========================================================
+def _quick_date(line: str) -> Optional[date]:
+    # "DTEND;TZID=Europe/Paris:20240101T100000" -> date(2024, 1, 1)
+    m = _DATE_PREFIX.match(line.rsplit(":", 1)[-1].strip())
+    if not m:
+        return None
+    try:
+        return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    except ValueError:
+        return None
+
+
+def ended_before(lines: list[str], cutoff: datetime) -> bool:
+    """
+    Dò nhanh trên text thô xem event chắc chắn đã kết thúc trước `cutoff` chưa.
+    Chỉ trả về True khi chắc chắn (có sai số _QUICK_SKIP_SLACK cho timezone);
+    event lặp (RRULE/RDATE), bản thay thế (RECURRENCE-ID) hoặc chỉ có DURATION thì luôn False.
+    """
+    dtstart = dtend = None
+    has_duration = False
+    for line in lines:
+        head = line[:8].upper()
+        if head.startswith(("RRULE", "RDATE", "RECURREN")):
+            return False
+        if head.startswith("DTEND"):
+            dtend = _quick_date(line)
+        elif head.startswith("DTSTART"):
+            dtstart = _quick_date(line)
+        elif head.startswith("DURATION"):
+            has_duration = True
+        elif head.startswith("BEGIN:") and not head.startswith("BEGIN:VE"):
+            # Tới component con (VALARM...), thuộc tính của event đã hết
+            break
+
+    end = dtend or (None if has_duration else dtstart)
+    if end is None:
+        return False
+    return end < (cutoff - _QUICK_SKIP_SLACK).date()
+
+
+# =========================================================
+# Parse / chuẩn hoá 1 event
+# =========================================================
+def _to_aware(value, local_tz: tzinfo) -> Optional[datetime]:
+    if value is None:
+        return None
+    # Date -> Datetime @ 00:00
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    # Nếu naive -> assume local_tz
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=local_tz)
+    return value
+
+
+def parse_vevent(lines: list[str], local_tz: tzinfo) -> Optional[dict]:
+    """
+    Parse 1 VEVENT (list dòng đã unfold) thành event dict:
+    { uid, summary, start_local, start_utc, end_local, end_utc, url }
+    - start_local luôn ở local_tz
+    - start_utc luôn UTC
+    - url lấy ưu tiên thuộc tính URL (nếu có), nếu không có thì bóc từ DESCRIPTION
+    Trả về None nếu event không có DTSTART hợp lệ.
+    """
+    return _event_from_component(Calendar.from_ical("\r\n".join(lines) + "\r\n"), local_tz)
+
+
+def _event_from_component(comp, local_tz: tzinfo) -> Optional[dict]:
+    uid = str(comp.get("uid"))
+    summary = str(comp.get("summary", "No title"))
+
+    # dtstart / dtend có thể là date hoặc datetime
+    try:
+        dtstart = _to_aware(comp.decoded("dtstart"), local_tz)
+    except Exception:
+        return None
+    try:
+        dtend = _to_aware(comp.decoded("dtend"), local_tz)
+    except Exception:
+        dtend = None
+
+    # Chuẩn hóa hai dạng
+    start_local = dtstart.astimezone(local_tz)
+    start_utc = start_local.astimezone(timezone.utc)
+
+    end_local = None
+    end_utc = None
+    if dtend is not None:
+        end_local = dtend.astimezone(local_tz)
+        end_utc = end_local.astimezone(timezone.utc)
+
+    # Ưu tiên thuộc tính URL trong ICS nếu có
+    ical_url = comp.get("url")
+    ical_url = str(ical_url) if ical_url else None
+
+    # Nếu không có, bóc từ description
+    description = comp.get("description")
+    desc_url = _clean_url_from_description(str(description) if description else None)
+
+    return {
+        "uid": uid,
+        "summary": summary,
+        "start_local": start_local,
+        "start_utc": start_utc,
+        "end_local": end_local,
+        "end_utc": end_utc,
+        "url": ical_url or desc_url,
+    }
+
+
+def _register_timezone(lines: list[str]) -> None:
+    # icalendar cache VTIMEZONE khi parse trong 1 VCALENDAR -> các event sau resolve được TZID tuỳ chỉnh
+    Calendar.from_ical("BEGIN:VCALENDAR\r\n" + "\r\n".join(lines) + "\r\nEND:VCALENDAR\r\n")
+
+
+# =========================================================
+# Event lặp
+# =========================================================
+def occurrence_uid(uid: str, original_start, local_tz: tzinfo) -> str:
+    """UID ổn định của 1 lần xuất hiện: theo giờ bắt đầu GỐC (trước khi bị RECURRENCE-ID dời)."""
+    start_utc = _to_aware(original_start, local_tz).astimezone(timezone.utc)
+    return f"{uid}{RECURRENCE_SEP}{start_utc:%Y%m%dT%H%M%SZ}"
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _property_dts(comp, name: str) -> Iterator:
+    """Các giá trị date/datetime của RDATE/EXDATE (PERIOD -> lấy thời điểm bắt đầu)."""
+    for prop in _as_list(comp.get(name)):
+        for item in getattr(prop, "dts", ()):
+            dt = item.dt
+            yield dt[0] if isinstance(dt, tuple) else dt
+
+
+def _rule_text(recur, floating: bool) -> str:
+    text = recur.to_ical().decode()
+    if floating:
+        # DTSTART không TZ -> UNTIL cũng phải "floating" (dateutil bắt buộc cùng kiểu)
+        return re.sub(r"(UNTIL=\d{8}(?:T\d{6})?)Z", r"\1", text)
+    # DTSTART có TZ mà UNTIL chỉ là ngày / giờ không Z -> coi là UTC cuối ngày đó
+    text = re.sub(r"UNTIL=(\d{8})(?=;|$)", r"UNTIL=\1T235959Z", text)
+    return re.sub(r"(UNTIL=\d{8}T\d{6})(?=;|$)", r"\1Z", text)
+
+
+_FIXED_FREQ = {"WEEKLY": timedelta(weeks=1), "DAILY": timedelta(days=1), "HOURLY": timedelta(hours=1),
+               "MINUTELY": timedelta(minutes=1), "SECONDLY": timedelta(seconds=1)}
+_RULE_PART = re.compile(r"(FREQ|INTERVAL|COUNT)=(\w+)")
+
+
+def _fast_forward(rule_text: str, base: datetime, after: datetime) -> datetime:
+    """
+    Dời DTSTART của rule chu kỳ cố định (tuần trở xuống, không COUNT) tới ngay trước `after`
+    theo bội số chu kỳ -> tập lần xuất hiện không đổi, nhưng rule bắt đầu từ 2015
+    không phải duyệt lại cả chục năm mỗi lần poll.
+    """
+    parts = dict(_RULE_PART.findall(rule_text))
+    step = _FIXED_FREQ.get(parts.get("FREQ", ""))
+    if step is None or "COUNT" in parts:
+        return base
+    step *= int(parts.get("INTERVAL", "1"))
+    periods = (after.replace(tzinfo=None) - base.replace(tzinfo=None)) // step - 1
+    return base + periods * step if periods > 0 else base
+
+
+def _match_kind(dt, floating: bool, local_tz: tzinfo) -> datetime:
+    """Đưa RDATE/EXDATE về cùng kiểu (naive/aware) với DTSTART để so trong rruleset."""
+    if not isinstance(dt, datetime):
+        dt = datetime.combine(dt, time.min)
+    if floating:
+        return dt.astimezone(local_tz).replace(tzinfo=None) if dt.tzinfo else dt
+    return dt if dt.tzinfo else dt.replace(tzinfo=local_tz)
+
+
+def iter_occurrences(comp, master: dict, local_tz: tzinfo, window_start: datetime, window_end: datetime,
+                     skip: frozenset = frozenset(), limit: int = MAX_OCCURRENCES) -> Iterator[dict]:
+    """
+    Generator các lần xuất hiện của event lặp có thời điểm kết thúc >= window_start
+    và bắt đầu <= window_end. Không bao giờ dựng toàn bộ rule (rule vô hạn vẫn an toàn):
+    dừng ngay khi vượt window_end hoặc đủ `limit` lần.
+    `skip`: UID lần xuất hiện đã có bản thay thế (RECURRENCE-ID).
+    """
+    raw_start = comp.decoded("dtstart")
+    floating = not isinstance(raw_start, datetime) or raw_start.tzinfo is None
+    base = raw_start if isinstance(raw_start, datetime) else datetime.combine(raw_start, time.min)
+    duration = master["end_utc"] - master["start_utc"] if master["end_utc"] else None
+
+    # Lần xuất hiện bắt đầu trước window_start nhưng chưa kết thúc vẫn tính
+    after = window_start - (duration or timedelta(0))
+    after = after.astimezone(local_tz).replace(tzinfo=None) if floating else after.astimezone(base.tzinfo)
+
+    rset = rruleset()
+    # DTSTART luôn là lần xuất hiện đầu tiên (RFC 5545), kể cả khi chỉ có RDATE
+    # hoặc không khớp RRULE; vẫn bị EXDATE / `skip` loại như mọi lần khác
+    rset.rdate(base)
+    for recur in _as_list(comp.get("rrule")):
+        text = _rule_text(recur, floating)
+        rset.rrule(rrulestr(text, dtstart=_fast_forward(text, base, after)))
+    for dt in _property_dts(comp, "rdate"):
+        rset.rdate(_match_kind(dt, floating, local_tz))
+    for dt in _property_dts(comp, "exdate"):
+        rset.exdate(_match_kind(dt, floating, local_tz))
+
+    count = 0
+    for occ in rset.xafter(after, inc=True):
+        start = _to_aware(occ, local_tz)
+        if start > window_end or count >= limit:
+            break
+        uid = occurrence_uid(master["uid"], occ, local_tz)
+        if uid in skip:
+            continue
+        start_local = start.astimezone(local_tz)
+        end_local = (start + duration).astimezone(local_tz) if duration is not None else None
+        count += 1
+        yield {
+            **master,
+            "uid": uid,
+            "start_local": start_local,
+            "start_utc": start_local.astimezone(timezone.utc),
+            "end_local": end_local,
+            "end_utc": end_local.astimezone(timezone.utc) if end_local else None,
+        }
+
+
+def iter_events(chunks: Iterable[bytes], local_tz: tzinfo, now: Optional[datetime] = None,
+                horizon: Optional[datetime] = None) -> Iterator[dict]:
+    """
+    Pipeline streaming: chunk bytes -> dòng -> VEVENT -> event dict.
+    Event đã kết thúc trước `now` bị loại (phần lớn loại ngay trên text thô).
+    Bộ nhớ chỉ phụ thuộc kích thước 1 VEVENT, không phụ thuộc kích thước feed
+    (trừ event lặp: giữ lại component master tới cuối feed vì bản thay thế
+    RECURRENCE-ID có thể nằm sau, rồi mới bung trong cửa sổ [now, horizon]).
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = horizon or now + DEFAULT_HORIZON
+    masters: list[tuple] = []
+    overridden: set[str] = set()
+
+    for name, lines in iter_components(iter_unfolded_lines(chunks)):
+        if name == "VTIMEZONE":
+            try:
+                _register_timezone(lines)
+            except Exception:
+                pass
+            continue
+
+        if ended_before(lines, now):
+            continue
+        try:
+            comp = Calendar.from_ical("\r\n".join(lines) + "\r\n")
+            ev = _event_from_component(comp, local_tz)
+        except Exception:
+            continue
+        if ev is None:
+            continue
+
+        recurrence_id = comp.get("recurrence-id")
+        if recurrence_id is not None:
+            # Bản thay thế 1 lần xuất hiện (dời giờ / đổi tên / huỷ)
+            ev["uid"] = occurrence_uid(ev["uid"], recurrence_id.dt, local_tz)
+            overridden.add(ev["uid"])
+            if str(comp.get("status", "")).upper() == "CANCELLED":
+                continue
+            ev["recurrence_id"] = ev["uid"]
+        elif "RRULE" in comp or "RDATE" in comp:
+            masters.append((comp, ev))
+            continue
+
+        if (ev["end_utc"] or ev["start_utc"]) < now:
+            continue
+        yield ev
+
+    skip = frozenset(overridden)
+    for comp, master in masters:
+        try:
+            for occ in iter_occurrences(comp, master, local_tz, now, horizon, skip):
+                occ["recurrence_id"] = occ["uid"]
+                yield occ
+        except Exception:
+            continue
+
+
+def iter_file_chunks(f, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    return iter(lambda: f.read(chunk_size), b"")
+
+
+# =========================================================
+# Bản ghi gọn để trả về từ worker pool
+# =========================================================
+class EventRecord(NamedTuple):
+    """Event đã chuẩn hoá, chỉ gồm kiểu cơ bản -> pickle nhanh khi đi qua process pool."""
+    uid: str
+    summary: str
+    start_ts: float          # epoch giây (UTC)
+    end_ts: Optional[float]
+    url: Optional[str]
+    feeds: tuple[str, ...] = ()  # tên các feed chứa event (gán sau khi gộp feed)
+    recurrence_id: Optional[str] = None  # có giá trị -> là 1 lần xuất hiện của event lặp (không lưu store)
+
+
+def to_record(ev: dict) -> EventRecord:
+    end_utc = ev["end_utc"]
+    return EventRecord(ev["uid"], ev["summary"], ev["start_utc"].timestamp(),
+                       end_utc.timestamp() if end_utc else None, ev["url"],
+                       recurrence_id=ev.get("recurrence_id"))
+
+
+def parse_ics_file(path: str, tz_name: str, now_ts: Optional[float] = None,
+                   horizon_ts: Optional[float] = None) -> list[EventRecord]:
+    """
+    Entry point cho thread/process pool: parse file ICS trên đĩa,
+    trả về list EventRecord (chưa kết thúc) đã sort theo start.
+    Event lặp được bung tới horizon_ts (mặc định now + DEFAULT_HORIZON).
+    Tham số và kết quả đều picklable.
+    """
+    now = datetime.fromtimestamp(now_ts, timezone.utc) if now_ts is not None else None
+    horizon = datetime.fromtimestamp(horizon_ts, timezone.utc) if horizon_ts is not None else None
+    with open(path, "rb") as f:
+        records = [to_record(ev) for ev in iter_events(iter_file_chunks(f), ZoneInfo(tz_name), now, horizon)]
+    records.sort(key=lambda r: r.start_ts)
+    return records
@@ -0,0 +1,268 @@
+# metrics.py
+"""
+Metrics tối giản theo format text của Prometheus (không cần prometheus_client):
+- Counter / Gauge / Histogram, có label; Gauge có thể lấy giá trị từ hàm lúc scrape
+- REGISTRY mặc định: module nào cũng khai báo metric của mình ở mức module
+- LoopLagMonitor: đo độ trễ event loop (loop bị chặn -> heartbeat gateway trễ)
+- make_app(): aiohttp app phục vụ GET /metrics
+"""
+import asyncio
+import functools
+import math
+import statistics
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+
+from aiohttp import web
+
+# Bucket mặc định (giây): đủ rộng cho gửi tin Discord lẫn parse feed lớn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional["_Metric"]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values) -> "_Metric":
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.help, registry=None)
+
+    def _series(self) -> Iterator[tuple[tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            yield from self._children.items()
+        else:
+            yield (), self
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._series():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_fmt(child.value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+
+    @property
+    def value(self) -> float:
+        return self._fn() if self._fn is not None else self._value
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Giá trị tính lúc scrape (vd. kích thước cache)."""
+        self._fn = fn
+
+
+class _Timer:
+    """Dùng được như context manager hoặc decorator (hàm sync lẫn async)."""
+
+    def __init__(self, histogram: "Histogram"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(self.histogram):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 registry: Registry = REGISTRY, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.last: Optional[float] = None  # quan sát gần nhất (cho lệnh admin)
+        self.max = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.help, registry=None, buckets=self.buckets[:-1])
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+        self.last = value
+        self.max = max(self.max, value)
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._series():
+            cumulative = 0
+            for bound, n in zip(child.buckets, child.counts):
+                cumulative += n
+                le = _labels(self.labelnames, values, f'le="{_fmt(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_fmt(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class LoopLagMonitor:
+    """
+    Ngủ `interval` giây liên tục; phần trễ so với dự kiến = thời gian event loop bị chặn.
+    Ghi vào histogram + gauge "lag lớn nhất trong cửa sổ gần đây".
+    keep_samples=True: giữ mọi mẫu trong `samples` để tính summary() (dùng trong bench/).
+    """
+
+    def __init__(self, histogram: Histogram, recent_max: Gauge, interval: float = 0.5, window: int = 120,
+                 keep_samples: bool = False):
+        self.histogram = histogram
+        self.recent_max = recent_max
+        self.interval = interval
+        self.window = window
+        self.samples: Optional[list[float]] = [] if keep_samples else None
+        self._recent: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - t - self.interval)
+            self.histogram.observe(lag)
+            if self.samples is not None:
+                self.samples.append(lag)
+            self._recent.append(lag)
+            if len(self._recent) > self.window:
+                del self._recent[0]
+            self.recent_max.set(max(self._recent))
+
+    def summary(self) -> dict:
+        """max / p99 / mean (ms) của các mẫu đã giữ (cần keep_samples=True)."""
+        s = sorted(self.samples or ()) or [0.0]
+        return {
+            "max_ms": s[-1] * 1000,
+            "p99_ms": s[min(len(s) - 1, int(len(s) * 0.99))] * 1000,
+            "mean_ms": statistics.fmean(s) * 1000,
+        }
+
+
+def make_app(registry: Registry = REGISTRY) -> web.Application:
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    return app
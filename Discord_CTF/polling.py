@@ -0,0 +1,29 @@
+# polling.py
+"""
+Chu kỳ poll ICS thích ứng (thay cho interval cố định 10 phút):
+- Lần poll có thay đổi -> quay về khoảng ngắn nhất (min_interval)
+- Không đổi -> nhân dần theo backoff tới max_interval
+- Lỗi (mọi feed fail) -> giữ nguyên khoảng hiện tại (circuit breaker của FeedClient lo phần còn lại)
+Thêm jitter ±10% để nhiều bot cùng calendar không poll dồn cùng lúc.
+"""
+import random
+from typing import Optional
+
+
+class AdaptiveInterval:
+    def __init__(self, min_interval: float, max_interval: float, backoff: float = 2.0, jitter: float = 0.1):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("need 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = max(1.0, backoff)
+        self.jitter = jitter
+        self.current = min_interval
+
+    def next(self, changed: Optional[bool]) -> float:
+        """Số giây tới lần poll kế tiếp, sau 1 lần poll có kết quả `changed` (None = lỗi)."""
+        if changed:
+            self.current = self.min_interval
+        elif changed is not None:
+            self.current = min(self.max_interval, self.current * self.backoff)
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
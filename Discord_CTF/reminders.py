@@ -0,0 +1,163 @@
+# reminders.py
+"""
+Bộ hẹn giờ nhắc nhở gom theo thời điểm (thay cho 4 job APScheduler / event):
+- Mỗi thời điểm bắn (fire_ts) là 1 slot chứa mọi nhắc nhở tới hạn cùng lúc
+- Heap các fire_ts riêng biệt + 1 task timer duy nhất chờ tới slot sớm nhất
+- Tới hạn -> gọi on_fire 1 lần với cả slot (bot gộp thành 1 tin digest)
+Số "job" tỉ lệ với số thời điểm khác nhau, không phải số event x 4.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+log = logging.getLogger("ctf-bot.reminders")
+
+Which = Union[int, str]  # 1..3 (D-N) hoặc "hour"
+Reminder = tuple[str, Which]  # (uid, which)
+
+# Ngủ tối đa chừng này giây mỗi lần để bám theo đồng hồ thực (máy sleep, chỉnh giờ...)
+_MAX_SLEEP = 60.0
+
+
+class ReminderEngine:
+    def __init__(self, on_fire: Callable[[float, list[Reminder]], Awaitable[None]],
+                 misfire_grace: Optional[float] = None,
+                 on_drop: Optional[Callable[[float, list[Reminder]], None]] = None):
+        """
+        on_fire(fire_ts, reminders): gọi khi 1 slot tới hạn.
+        misfire_grace: slot trễ quá số giây này thì bỏ (gọi on_drop) thay vì bắn; None = luôn bắn.
+        """
+        self.on_fire = on_fire
+        self.on_drop = on_drop
+        self.misfire_grace = misfire_grace
+        self._slots: dict[float, dict[Reminder, None]] = {}   # fire_ts -> reminders (giữ thứ tự thêm)
+        self._heap: list[float] = []                           # fire_ts riêng biệt (xoá lười)
+        self._by_uid: dict[str, dict[Which, float]] = {}       # uid -> which -> fire_ts
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- trạng thái ----------
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._by_uid.values())
+
+    @property
+    def slot_count(self) -> int:
+        return len(self._slots)
+
+    def next_fire_ts(self) -> Optional[float]:
+        self._drop_stale_heads()
+        return self._heap[0] if self._heap else None
+
+    def get(self, uid: str, which: Which) -> Optional[float]:
+        return self._by_uid.get(uid, {}).get(which)
+
+    # ---------- thêm / xoá ----------
+    def add(self, uid: str, which: Which, fire_ts: float) -> bool:
+        """Thêm nhắc nhở; trả về False nếu (uid, which) đã có đúng thời điểm này."""
+        current = self.get(uid, which)
+        if current == fire_ts:
+            return False
+        if current is not None:
+            self._discard(uid, which, current)
+
+        slot = self._slots.get(fire_ts)
+        if slot is None:
+            slot = self._slots[fire_ts] = {}
+            heapq.heappush(self._heap, fire_ts)
+            if self._heap[0] == fire_ts:
+                self._wake.set()  # slot mới sớm hơn -> timer tính lại
+        slot[(uid, which)] = None
+        self._by_uid.setdefault(uid, {})[which] = fire_ts
+        return True
+
+    def for_event(self, uid: str) -> dict[Which, float]:
+        """which -> fire_ts của các nhắc nhở đang chờ của 1 event (bản sao)."""
+        return dict(self._by_uid.get(uid, {}))
+
+    def remove(self, uid: str, which: Which) -> bool:
+        current = self.get(uid, which)
+        if current is None:
+            return False
+        self._discard(uid, which, current)
+        return True
+
+    def remove_event(self, uid: str) -> int:
+        """Xoá mọi nhắc nhở của 1 event. Trả về số nhắc nhở bị xoá."""
+        entries = self._by_uid.pop(uid, None)
+        if not entries:
+            return 0
+        for which, fire_ts in entries.items():
+            self._discard_from_slot(uid, which, fire_ts)
+        return len(entries)
+
+    def _discard(self, uid: str, which: Which, fire_ts: float) -> None:
+        per_uid = self._by_uid.get(uid)
+        if per_uid is not None:
+            per_uid.pop(which, None)
+            if not per_uid:
+                del self._by_uid[uid]
+        self._discard_from_slot(uid, which, fire_ts)
+
+    def _discard_from_slot(self, uid: str, which: Which, fire_ts: float) -> None:
+        slot = self._slots.get(fire_ts)
+        if slot is None:
+            return
+        slot.pop((uid, which), None)
+        if not slot:
+            del self._slots[fire_ts]  # fire_ts còn trong heap, bị bỏ khi lên đầu
+
+    def _drop_stale_heads(self) -> None:
+        while self._heap and self._heap[0] not in self._slots:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: float) -> list[tuple[float, list[Reminder]]]:
+        due = []
+        self._drop_stale_heads()
+        while self._heap and self._heap[0] <= now:
+            fire_ts = heapq.heappop(self._heap)
+            slot = self._slots.pop(fire_ts, None)
+            if slot:
+                for uid, which in slot:
+                    self._discard(uid, which, fire_ts)  # slot đã pop -> chỉ dọn _by_uid
+                due.append((fire_ts, list(slot)))
+            self._drop_stale_heads()
+        return due
+
+    # ---------- timer ----------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="reminder-engine")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for fire_ts, reminders in self._pop_due(now):
+                late = now - fire_ts
+                if self.misfire_grace is not None and late > self.misfire_grace:
+                    log.warning("Dropped %d reminders missed by %.0fs", len(reminders), late)
+                    if self.on_drop:
+                        self.on_drop(fire_ts, reminders)
+                    continue
+                try:
+                    await self.on_fire(fire_ts, reminders)
+                except Exception:
+                    log.exception("Reminder slot at %s failed", fire_ts)
+
+            head = self.next_fire_ts()
+            timeout = _MAX_SLEEP if head is None else min(_MAX_SLEEP, max(0.0, head - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,106 @@
+# store.py
+"""
+Lưu trạng thái bot CTF xuống SQLite để khởi động lại không cần fetch/parse lại ICS:
+- events    : snapshot events_cache (uid, summary, start/end epoch, url)
+- reminders : các nhắc nhở đã lên lịch (job_id, uid, which, fire_ts)
+- meta      : key/value (ETag, Last-Modified, hash body ICS...)
+"""
+import sqlite3
+from typing import Iterable, Optional, Union
+
+from ics_parser import EventRecord
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    uid      TEXT PRIMARY KEY,
+    summary  TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts   REAL,
+    url      TEXT,
+    feeds    TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    job_id  TEXT PRIMARY KEY,
+    uid     TEXT NOT NULL,
+    which   TEXT NOT NULL,
+    fire_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reminders_uid ON reminders(uid);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+Which = Union[int, str]  # 1..3 (D-N) hoặc "hour"
+
+
+def _encode_which(which: Which) -> str:
+    return str(which)
+
+
+def _decode_which(value: str) -> Which:
+    return int(value) if value.isdigit() else value
+
+
+class EventStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(events)")}
+        if "feeds" not in columns:
+            # DB tạo trước khi có multi-feed
+            self.conn.execute("ALTER TABLE events ADD COLUMN feeds TEXT NOT NULL DEFAULT ''")
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # ---------- events ----------
+    def load_events(self) -> list[EventRecord]:
+        rows = self.conn.execute("SELECT uid, summary, start_ts, end_ts, url, feeds FROM events ORDER BY start_ts")
+        return [EventRecord(*row[:5], tuple(filter(None, row[5].split("\n")))) for row in rows]
+
+    def upsert_events(self, records: Iterable[EventRecord]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO events (uid, summary, start_ts, end_ts, url, feeds) VALUES (?, ?, ?, ?, ?, ?)",
+                (rec[:5] + ("\n".join(rec.feeds),) for rec in records),
+            )
+
+    def delete_events(self, uids: Iterable[str]) -> None:
+        with self.conn:
+            self.conn.executemany("DELETE FROM events WHERE uid = ?", ((uid,) for uid in uids))
+
+    # ---------- reminders ----------
+    def load_reminders(self) -> list[tuple[str, str, Which, float]]:
+        rows = self.conn.execute("SELECT job_id, uid, which, fire_ts FROM reminders ORDER BY fire_ts")
+        return [(job_id, uid, _decode_which(which), fire_ts) for job_id, uid, which, fire_ts in rows]
+
+    def add_reminders(self, rows: Iterable[tuple[str, str, Which, float]]) -> None:
+        """rows: (job_id, uid, which, fire_ts); cả lô trong 1 transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO reminders (job_id, uid, which, fire_ts) VALUES (?, ?, ?, ?)",
+                ((job_id, uid, _encode_which(which), fire_ts) for job_id, uid, which, fire_ts in rows),
+            )
+
+    def delete_reminders(self, job_ids: Iterable[str] = (), uids: Iterable[str] = ()) -> None:
+        """Xoá theo job_id và/hoặc theo uid event (mọi nhắc nhở của event) trong 1 transaction."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM reminders WHERE job_id = ?", ((job_id,) for job_id in job_ids))
+            self.conn.executemany("DELETE FROM reminders WHERE uid = ?", ((uid,) for uid in uids))
+
+    # ---------- meta ----------
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, items: dict[str, Optional[str]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", items.items()
+            )
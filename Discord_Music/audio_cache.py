@@ -0,0 +1,222 @@
+# audio_cache.py
+"""
+Cache audio trên đĩa cho bài hay phát (danh sách songs.json):
+- Mỗi bài lưu 1 file Ogg/Opus 48 kHz, volume đã áp sẵn lúc mã hoá -> lúc phát không cần decode/encode lại
+- Tổng dung lượng giới hạn `max_bytes`, đầy thì xoá bài dùng lâu nhất (LRU, thứ tự lưu trong index.json)
+- warm(): resolve + mã hoá ở nền bằng FFmpeg (giới hạn số tiến trình chạy cùng lúc)
+- OpusFileSource: đọc thẳng packet Opus từ file gửi cho Discord (passthrough, không process FFmpeg,
+  không phụ thuộc mạng)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import discord
+from discord.oggparse import OggStream
+
+from extract_cache import video_key
+
+FRAME_SECONDS = 0.02  # libopus mặc định 20 ms/packet (cũng là kích thước frame Discord dùng)
+INDEX_FILE = "index.json"
+# Tên file do _filename() tạo (+ file tạm lúc mã hoá); load() chỉ dọn file khớp mẫu này
+_CACHE_FILE = re.compile(r"[0-9a-f]{32}\.ogg(?:\.part)?")
+
+
+class OpusFileSource(discord.AudioSource):
+    """Phát file Ogg/Opus đã mã hoá sẵn: chỉ tách packet, không decode."""
+
+    def __init__(self, path: str, start: float = 0.0):
+        self._file = open(path, "rb")
+        self._packets = self._iter_packets(int(start / FRAME_SECONDS))
+
+    def _iter_packets(self, skip: int):
+        for packet in OggStream(self._file).iter_packets():
+            if packet.startswith((b"OpusHead", b"OpusTags")):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            yield packet
+
+    def read(self) -> bytes:
+        return next(self._packets, b"")
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self._file.close()
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int, audio_filter: str = "volume=0.25",
+                 bitrate: str = "128k", concurrency: int = 1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.audio_filter = audio_filter
+        self.bitrate = bitrate
+        self._index: OrderedDict[str, dict] = OrderedDict()  # key -> {"file", "size", "title", "duration"}
+        self._total = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._dirty = False
+        self.hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    @staticmethod
+    def _filename(key: str) -> str:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".ogg"
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    # ----------------------------------------------------------------- tra cứu
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """Info để phát từ đĩa ({"path", "title", "duration"}), None nếu chưa cache."""
+        if not self.enabled:
+            return None
+        key = video_key(url)
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        path = self._path(entry["file"])
+        if not os.path.exists(path):
+            self._drop(key)
+            return None
+        self._index.move_to_end(key)
+        self._dirty = True
+        self.hits += 1
+        return {"path": path, "title": entry.get("title"), "duration": entry.get("duration")}
+
+    def __contains__(self, url: str) -> bool:
+        return video_key(url) in self._index
+
+    # ----------------------------------------------------------------- warm
+
+    async def warm(self, url: str, resolve: Callable[[str], Awaitable[dict]], title: Optional[str] = None) -> bool:
+        """Resolve + mã hoá `url` vào cache (gộp các lần gọi trùng). True nếu bài đã nằm trong cache."""
+        if not self.enabled:
+            return False
+        key = video_key(url)
+        if key in self._index:
+            return True
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._warm(key, url, resolve, title))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _warm(self, key: str, url: str, resolve, title: Optional[str]) -> bool:
+        async with self._semaphore:
+            info = await resolve(url)
+            if "entries" in info or not info.get("url"):
+                return False  # playlist -> không cache cả danh sách
+            os.makedirs(self.directory, exist_ok=True)
+            filename = self._filename(key)
+            tmp = self._path(filename + ".part")
+            if not await self._encode(info["url"], tmp):
+                return False
+            size = os.path.getsize(tmp)
+            os.replace(tmp, self._path(filename))
+        self._add(key, {"file": filename, "size": size, "title": title or info.get("title"),
+                        "duration": info.get("duration")})
+        print(f"Audio cache: đã lưu {title or info.get('title') or url} ({size / 2 ** 20:.1f} MiB)")
+        return True
+
+    async def _encode(self, stream_url: str, dest: str) -> bool:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5",
+            "-i", stream_url, "-vn", "-af", self.audio_filter,
+            "-c:a", "libopus", "-b:a", self.bitrate, "-ar", "48000", "-ac", "2", "-f", "ogg", dest,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            _remove(dest)
+            raise
+        if process.returncode != 0:
+            print(f"Audio cache: FFmpeg lỗi ({process.returncode}): {stderr.decode(errors='replace')[-300:]}")
+            _remove(dest)
+            return False
+        return True
+
+    def _add(self, key: str, entry: dict) -> None:
+        self._drop(key)
+        self._index[key] = entry
+        self._total += entry["size"]
+        self._dirty = True
+        # Xoá bài dùng lâu nhất tới khi vừa giới hạn (luôn giữ bài vừa thêm)
+        while self._total > self.max_bytes and len(self._index) > 1:
+            self._drop(next(iter(self._index)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        self._total -= entry["size"]
+        self._dirty = True
+        _remove(self._path(entry["file"]))  # file đang phát trên Windows không xoá được -> dọn lúc load()
+
+    # ----------------------------------------------------------------- disk
+
+    def load(self) -> int:
+        """Nạp index, bỏ entry mất file và xoá file cache không còn trong index (vd. .part khi tắt ngang)."""
+        if not self.enabled:
+            return 0
+        try:
+            with open(self._path(INDEX_FILE), "r", encoding="utf-8") as file:
+                raw = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raw = {}
+        for key, entry in raw.items():
+            name = entry.get("file", "")
+            path = self._path(name)
+            if name.endswith(".ogg") and _CACHE_FILE.fullmatch(name) and os.path.isfile(path):
+                entry["size"] = os.path.getsize(path)
+                self._index[key] = entry
+                self._total += entry["size"]
+        known = {entry["file"] for entry in self._index.values()}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                # AUDIO_CACHE_DIR có thể là thư mục dùng chung -> không đụng file không phải của cache
+                if name not in known and _CACHE_FILE.fullmatch(name):
+                    _remove(self._path(name))
+        while self._total > self.max_bytes and len(self._index) > 1:
+            self._drop(next(iter(self._index)))
+        return len(self._index)
+
+    def save(self) -> None:
+        if not self.enabled or not self._dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(INDEX_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(self._index, file, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._dirty = False
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,71 @@
+# cogs/admin.py
+"""Lệnh quản trị: nạp lại cog tại chỗ (?reload), khởi động lại (?restart), trợ giúp (?help_me)."""
+from discord.ext import commands
+
+import core
+
+# Các extension của bot; ?reload nạp lại code lệnh mà không rớt voice / hàng đợi (state nằm ở core.py)
+EXTENSIONS = ("cogs.library", "cogs.playback", "cogs.queue_control", "cogs.members", "cogs.admin")
+
+
+class Admin(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="reload")
+    @commands.has_permissions(administrator=True)
+    async def reload(self, ctx, name: str = "all"):
+        """Nạp lại 1 cog (vd. playback) hoặc tất cả."""
+        targets = EXTENSIONS if name == "all" else (f"cogs.{name}",)
+        failed = []
+        for ext in targets:
+            try:
+                await self.bot.reload_extension(ext)
+            except commands.ExtensionNotLoaded:
+                try:
+                    await self.bot.load_extension(ext)
+                except commands.ExtensionError as e:
+                    failed.append(f"{ext}: {e}")
+            except commands.ExtensionError as e:
+                failed.append(f"{ext}: {e}")
+        if failed:
+            await ctx.send("❌ Lỗi nạp lại:\n" + "\n".join(failed))
+        else:
+            await ctx.send(f"♻ Đã nạp lại {len(targets)} cog.")
+
+    @commands.command(name="restart")
+    async def restart(self, ctx):
+        """Khởi động lại bot; hàng đợi và bài đang phát được lưu lại rồi phát tiếp."""
+        await ctx.send("🔄 Đang khởi động lại bot... (hàng đợi sẽ được phát tiếp)")
+        core.restart_process()
+
+    @commands.command(name="help_me")
+    async def help_me(self, ctx):
+        """Hiển thị danh sách lệnh hiện có."""
+        help_message = """
+# 🎵 Danh sách các lệnh của bot:
+- `?list_songs` : In ra danh sách các bài nhạc đã lưu.
+- `?add_song "<name>" "<url>"` : Lưu bài hát mới vào danh sách.
+- `?delete_song <name>` : Xóa một bài hát trong danh sách.
+- `?play <url>` : Phát nhạc từ YouTube.
+- `?play_all` : Phát tất cả nhạc trong danh sách.
+- `?play_name <tên bài>` : Phát nhạc theo tên từ danh sách có sẵn.
+- `?pause` : Tạm dừng nhạc.
+- `?resume` : Tiếp tục phát nhạc.
+- `?stop` : Dừng nhạc và thoát khỏi kênh voice.
+- `?skip` : Bỏ qua bài hát hiện tại nhưng phát lại sau.
+- `?queue [trang]` : Xem hàng đợi.
+- `?shuffle` : Trộn ngẫu nhiên hàng đợi.
+- `?remove <vị trí>` : Xóa một bài khỏi hàng đợi.
+- `?move <từ> <tới>` : Đổi vị trí một bài trong hàng đợi.
+- `?loop <off|track|queue>` : Chế độ lặp.
+- `?history` : Các bài đã phát gần đây.
+- `?reload [cog|all]` : Nạp lại code lệnh mà không ngắt nhạc (admin).
+- `?restart` : Khởi động lại bot.
+- `?help_me` : Hiển thị danh sách lệnh.
+"""
+        await ctx.send(help_message)
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
@@ -0,0 +1,48 @@
+# cogs/library.py
+"""Lệnh chỉnh sửa danh sách nhạc đã lưu (songs.json)."""
+from discord.ext import commands
+
+import core
+
+
+class Library(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="list_songs")
+    async def list_songs(self, ctx):
+        """Hiển thị danh sách bài hát có sẵn."""
+        if not core.songs:
+            await ctx.send("📂 Không có bài hát nào trong danh sách!")
+            return
+
+        song_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(core.songs.keys())])
+        await ctx.send(f"# 🎶 Danh sách bài hát:\n{song_list}")
+
+    @commands.command(name="add_song")
+    async def add_song(self, ctx, name: str, url: str):
+        """Thêm bài hát vào danh sách"""
+        if name in core.songs:
+            await ctx.send(f"❌ Bài hát **{name}** đã có trong danh sách!")
+            return
+
+        core.songs[name] = url
+        core.save_songs()
+        await ctx.send(f"✅ Đã thêm bài hát **{name}** vào danh sách!")
+        if core.audio_cache.enabled:
+            core.spawn_warm(core.warm_song(name, url))  # mã hoá sẵn ở nền -> lần phát sau đọc từ đĩa
+
+    @commands.command(name="delete_song")
+    async def delete_song(self, ctx, *, name: str):
+        """Xóa bài hát khỏi danh sách"""
+        if name not in core.songs:
+            await ctx.send(f"❌ Không tìm thấy bài hát **{name}** trong danh sách!")
+            return
+
+        del core.songs[name]
+        core.save_songs()
+        await ctx.send(f"🗑 Đã xóa bài hát **{name}** khỏi danh sách!")
+
+
+async def setup(bot):
+    await bot.add_cog(Library(bot))
@@ -0,0 +1,45 @@
+# cogs/members.py
+"""Xử lý thành viên mới: gán role mặc định và đổi nickname."""
+import discord
+from discord.ext import commands
+
+# Tên role và prefix cho nickname
+AUTO_ROLE_NAME = "Dân thường"
+NICK_PREFIX = "[Dân thường] "
+
+
+class Members(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        """
+        Sự kiện khi thành viên mới join: gán role và đổi nickname.
+        """
+        guild = member.guild
+        role = discord.utils.get(guild.roles, name=AUTO_ROLE_NAME)
+
+        # Gán role nếu có
+        if role:
+            try:
+                await member.add_roles(role)
+                print(f"Gán role '{AUTO_ROLE_NAME}' cho {member.name}")
+            except discord.Forbidden:
+                print("Bot không có quyền gán vai trò.")
+
+        # Đổi nickname
+        try:
+            # Ưu tiên lấy Global Name (hiển thị chính thức), fallback về username
+            display_name = member.global_name or member.name
+            new_nick = f"[Dân thường] {display_name}"
+            await member.edit(nick=new_nick)
+            print(f"Đã đổi nickname của {member.name} thành {new_nick}")
+        except discord.Forbidden:
+            print("Bot không có quyền đổi nickname.")
+        except Exception as e:
+            print(f"Lỗi đổi nickname: {e}")
+
+
+async def setup(bot):
+    await bot.add_cog(Members(bot))
@@ -0,0 +1,104 @@
+# cogs/playback.py
+"""Lệnh phát nhạc; mọi thao tác phát/chuyển bài đều gửi qua actor của guild (core.get_player)."""
+import discord
+from discord.ext import commands
+
+import core
+from music_queue import Track
+
+
+async def connect_voice(ctx):
+    """Vào kênh voice của người gọi lệnh (nếu bot chưa ở trong kênh). False nếu không vào được."""
+    voice_client = ctx.guild.voice_client
+    if voice_client and voice_client.is_connected():
+        return True
+    if ctx.author.voice is None:
+        await ctx.send("❌ Bạn cần vào một kênh voice trước!")
+        return False
+    core.voice_clients[ctx.guild.id] = await ctx.author.voice.channel.connect()
+    return True
+
+
+async def enqueue(ctx, tracks):
+    """Đưa bài vào hàng đợi qua actor của guild (actor tự phát nếu đang rảnh)."""
+    try:
+        if not await connect_voice(ctx):
+            return
+    except discord.HTTPException:
+        await ctx.send("❌ Mạng bị gián đoạn, thử lại sau!")
+        return
+    except Exception as e:
+        print(e)
+        await ctx.send("❌ Không thể phát nhạc!")
+        return
+    player = core.get_player(ctx.guild)
+    player.channel = ctx.channel
+    player.send("enqueue", tracks)
+
+
+class Playback(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="play")
+    async def play(self, ctx, url: str):
+        """Phát nhạc từ YouTube, Spotify, SoundCloud."""
+        await enqueue(ctx, [Track(url, requester=ctx.author.display_name)])
+
+    @commands.command(name="play_all")
+    async def play_all(self, ctx):
+        """Phát toàn bộ danh sách nhạc đã lưu."""
+        if not core.songs:
+            await ctx.send("📂 Không có bài hát nào trong danh sách!")
+            return
+
+        requester = ctx.author.display_name
+        await enqueue(ctx, [Track(url, title=name, requester=requester) for name, url in core.songs.items()])
+
+    @commands.command(name="play_name")
+    async def play_name(self, ctx, *song_name):
+        """Phát nhạc theo tên từ danh sách có sẵn."""
+        song_name = " ".join(song_name)
+        if song_name in core.songs:
+            await enqueue(ctx, [Track(core.songs[song_name], title=song_name, requester=ctx.author.display_name)])
+        else:
+            await ctx.send("❌ Không tìm thấy bài hát trong danh sách!")
+
+    @commands.command(name="pause")
+    async def pause(self, ctx):
+        """Tạm dừng nhạc."""
+        voice_client = ctx.guild.voice_client
+        if voice_client and voice_client.is_playing():
+            core.get_player(ctx.guild).send("pause")
+            await ctx.send("⏸ Nhạc đã bị tạm dừng.")
+
+    @commands.command(name="resume")
+    async def resume(self, ctx):
+        """Tiếp tục phát nhạc."""
+        voice_client = ctx.guild.voice_client
+        if voice_client and voice_client.is_paused():
+            core.get_player(ctx.guild).send("resume")
+            await ctx.send("▶ Tiếp tục phát nhạc.")
+
+    @commands.command(name="stop")
+    async def stop(self, ctx):
+        """Dừng nhạc và ngắt kết nối."""
+        voice_client = ctx.guild.voice_client
+        core.get_player(ctx.guild).send("stop")
+        if voice_client and voice_client.is_connected():
+            await ctx.send("⏹ Đã dừng nhạc và thoát khỏi kênh voice.")
+
+    @commands.command(name="skip")
+    async def skip(self, ctx):
+        """Bỏ qua bài hát hiện tại và phát bài tiếp theo."""
+        voice_client = ctx.guild.voice_client
+        if voice_client and (voice_client.is_playing() or voice_client.is_paused()):
+            # Chỉ actor dừng bài + chuyển bài (trước đây stop() kích hoạt callback và lệnh lại gọi play_next -> nhảy 2 bài)
+            core.get_player(ctx.guild).send("skip")
+            await ctx.send("⏭ Đã bỏ qua bài hát!")
+        else:
+            await ctx.send("❌ Không có bài hát nào đang phát.")
+
+
+async def setup(bot):
+    await bot.add_cog(Playback(bot))
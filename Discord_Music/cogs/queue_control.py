@@ -0,0 +1,105 @@
+# cogs/queue_control.py
+"""Lệnh xem / sắp xếp hàng đợi (?queue, ?shuffle, ?remove, ?move, ?loop, ?history)."""
+from discord.ext import commands
+
+import core
+from music_queue import LOOP_MODES, format_duration
+
+QUEUE_PAGE_SIZE = 10
+
+
+def track_line(track, index=None):
+    title = track.label if len(track.label) <= 60 else track.label[:57] + "..."
+    who = f" — {track.requester}" if track.requester else ""
+    prefix = f"{index}. " if index is not None else ""
+    return f"{prefix}{title} `{format_duration(track.duration)}`{who}"
+
+
+class QueueControl(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="queue")
+    async def show_queue(self, ctx, page: int = 1):
+        """Hiển thị hàng đợi theo trang."""
+        queue = core.get_queue(ctx.guild.id)
+        if queue.current is None and not queue:
+            await ctx.send("📭 Hàng đợi trống!")
+            return
+
+        pages = max(1, -(-len(queue) // QUEUE_PAGE_SIZE))
+        page = max(1, min(page, pages))
+        start = (page - 1) * QUEUE_PAGE_SIZE
+        lines = []
+        if queue.current is not None:
+            lines.append(f"🎵 Đang phát: {track_line(queue.current)}")
+        lines.extend(track_line(track, start + i + 1) for i, track in enumerate(queue.page(start, QUEUE_PAGE_SIZE)))
+        total = format_duration(queue.total_duration)
+        if queue.unknown_durations:
+            total += f" + {queue.unknown_durations} bài chưa rõ"
+        lines.append(f"\n📜 {len(queue)} bài chờ · {total} · trang {page}/{pages} · lặp: {queue.loop}")
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="shuffle")
+    async def shuffle(self, ctx):
+        """Trộn ngẫu nhiên hàng đợi."""
+        queue = core.get_queue(ctx.guild.id)
+        if len(queue) < 2:
+            await ctx.send("❌ Hàng đợi không đủ bài để trộn!")
+            return
+        queue.shuffle()
+        core.get_player(ctx.guild).prefetch()
+        await ctx.send(f"🔀 Đã trộn {len(queue)} bài trong hàng đợi!")
+
+    @commands.command(name="remove")
+    async def remove(self, ctx, index: int):
+        """Xóa bài ở vị trí <index> trong hàng đợi."""
+        queue = core.get_queue(ctx.guild.id)
+        if not 1 <= index <= len(queue):
+            await ctx.send(f"❌ Vị trí không hợp lệ (1-{len(queue)})!")
+            return
+        track = queue.remove(index - 1)
+        if index == 1:
+            core.get_player(ctx.guild).prefetch()  # bài kế tiếp đổi -> warm bài mới
+        await ctx.send(f"🗑 Đã xóa **{track.label}** khỏi hàng đợi!")
+
+    @commands.command(name="move")
+    async def move(self, ctx, src: int, dst: int):
+        """Chuyển bài từ vị trí <src> tới vị trí <dst>."""
+        queue = core.get_queue(ctx.guild.id)
+        if not (1 <= src <= len(queue) and 1 <= dst <= len(queue)):
+            await ctx.send(f"❌ Vị trí không hợp lệ (1-{len(queue)})!")
+            return
+        track = queue.move(src - 1, dst - 1)
+        if src == 1 or dst == 1:
+            core.get_player(ctx.guild).prefetch()  # bài kế tiếp đổi -> warm bài mới
+        await ctx.send(f"↕ Đã chuyển **{track.label}** tới vị trí {dst}!")
+
+    @commands.command(name="loop")
+    async def loop(self, ctx, mode: str = None):
+        """Chế độ lặp: off | track | queue (bỏ trống = xem chế độ hiện tại)."""
+        queue = core.get_queue(ctx.guild.id)
+        if mode is None:
+            await ctx.send(f"🔁 Chế độ lặp hiện tại: **{queue.loop}**")
+            return
+        if mode not in LOOP_MODES:
+            await ctx.send(f"❌ Chế độ không hợp lệ! Chọn một trong: {', '.join(LOOP_MODES)}")
+            return
+        queue.loop = mode
+        core.get_player(ctx.guild).prefetch()
+        await ctx.send(f"🔁 Đã đặt chế độ lặp: **{mode}**")
+
+    @commands.command(name="history")
+    async def history(self, ctx):
+        """Hiển thị các bài đã phát gần đây."""
+        queue = core.get_queue(ctx.guild.id)
+        if not queue.history:
+            await ctx.send("📭 Chưa phát bài nào!")
+            return
+        recent = list(queue.history)[-QUEUE_PAGE_SIZE:][::-1]
+        lines = [track_line(track, i + 1) for i, track in enumerate(recent)]
+        await ctx.send("# 🕘 Đã phát gần đây:\n" + "\n".join(lines))
+
+
+async def setup(bot):
+    await bot.add_cog(QueueControl(bot))
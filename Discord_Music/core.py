@@ -0,0 +1,298 @@
+# core.py
+"""
+Trạng thái dùng chung của bot nhạc, KHÔNG nằm trong extension nào nên không bị nạp lại khi
+?reload các cog: voice client, hàng đợi, actor phát nhạc, extract cache, pool extract, prefetch,
+audio cache trên đĩa cho các bài trong songs.json.
+Các cog (cogs/*.py) chỉ chứa lệnh và import module này.
+
+Thay cho restart hằng đêm: cleanup_idle() (định kỳ) giải phóng actor + FFmpeg đã warm của guild
+không còn ở kênh voice (tự rời kênh khi rảnh chỉ bật khi đặt IDLE_DISCONNECT); nightly_cleanup() thay mới pool extract
+(YoutubeDL phình bộ nhớ theo thời gian) rồi gc.
+"""
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+
+import discord
+from dotenv import load_dotenv
+
+from audio_cache import AudioCache, OpusFileSource
+from extract_cache import ExtractCache, video_key
+from extract_service import ExtractionService
+from music_queue import GuildQueue, Track
+from playback_state import load_state, restore_queue, save_state
+from player import GuildPlayer
+from prefetch import Prefetcher
+
+load_dotenv()
+
+voice_clients = {}
+queues = {}  # guild_id -> GuildQueue
+
+def get_queue(guild_id):
+    queue = queues.get(guild_id)
+    if queue is None:
+        queue = queues[guild_id] = GuildQueue()
+    return queue
+
+yt_dl_options = {
+    "format": "bestaudio/best",
+    "noplaylist": False,  
+    "default_search": "ytsearch",  
+    "source_address": "0.0.0.0",
+    # Playlist/ytsearch chỉ trả ID + tiêu đề (nhẹ, nhanh); từng bài được resolve khi gần tới lượt
+    "extract_flat": "in_playlist",
+    "postprocessors": [{
+        "key": "FFmpegExtractAudio",
+        "preferredcodec": "mp3",
+        "preferredquality": "192",
+    }]
+}
+
+# Pool extract riêng: EXTRACT_WORKERS worker (thread|process), mỗi worker 1 YoutubeDL, chia lượt theo guild
+extractor = ExtractionService(yt_dl_options,
+                              workers=int(os.getenv("EXTRACT_WORKERS", "2")),
+                              mode=os.getenv("EXTRACT_MODE", "thread"),
+                              start_method=os.getenv("EXTRACT_START_METHOD") or None)
+
+AUDIO_FILTER = "volume=0.25"
+ffmpeg_options = {'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5','options': f'-vn -filter:a "{AUDIO_FILTER}"'}
+
+# Cache kết quả extract theo ID video (TTL = hạn của link stream); để trống EXTRACT_CACHE_FILE = chỉ cache trong RAM
+extract_cache = ExtractCache(
+    max_entries=int(os.getenv("EXTRACT_CACHE_SIZE", "512")),
+    path=os.getenv("EXTRACT_CACHE_FILE", "extract_cache.json") or None,
+)
+print(f"Extract cache: nạp {extract_cache.load()} bài từ đĩa")
+
+def save_extract_cache():
+    try:
+        extract_cache.save()
+    except OSError as e:
+        print(f"Lỗi lưu extract cache: {e}")
+
+# Hàng đợi + bài đang phát (kèm vị trí) được lưu lại để khởi động lại không mất phiên nghe; để trống = tắt
+PLAYBACK_STATE_FILE = os.getenv("PLAYBACK_STATE_FILE", "playback_state.json")
+
+def save_playback_state():
+    if not PLAYBACK_STATE_FILE:
+        return
+    try:
+        save_state(PLAYBACK_STATE_FILE, players)
+    except OSError as e:
+        print(f"Lỗi lưu trạng thái phát nhạc: {e}")
+
+async def save_state_job():
+    # Coroutine -> APScheduler chạy trên event loop, không đọc cache/hàng đợi từ thread khác
+    save_extract_cache()
+    save_audio_cache()
+    save_playback_state()
+
+def restart_process():
+    save_playback_state()
+    save_extract_cache()
+    save_audio_cache()
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+async def restore_playback(bot):
+    """Vào lại kênh voice và phát tiếp hàng đợi đã lưu trước lần khởi động lại."""
+    if not PLAYBACK_STATE_FILE:
+        return
+    for guild_id, state in load_state(PLAYBACK_STATE_FILE).items():
+        guild = bot.get_guild(guild_id)
+        channel = guild.get_channel(state["voice_channel"]) if guild else None
+        if channel is None or not any(not member.bot for member in channel.members):
+            continue  # không còn ai nghe -> bỏ
+        try:
+            if guild.voice_client is None:
+                voice_clients[guild_id] = await channel.connect()
+        except Exception as e:
+            print(f"Không vào lại được kênh voice ({guild.name}): {e}")
+            continue
+        player = get_player(guild)
+        if state.get("text_channel"):
+            player.channel = guild.get_channel(state["text_channel"])
+        current = restore_queue(player.queue, state)
+        if current is not None:
+            player.send("restore", current, state.get("position", 0.0))
+        else:
+            player.send("start")
+        print(f"Khôi phục {guild.name}: {len(player.queue)} bài chờ")
+
+async def extract(url, guild_id=0, priority=True, params=None):
+    """extract_info có cache: hit -> trả ngay, không gọi mạng. priority=False cho việc chạy nền."""
+    data = extract_cache.get(url)
+    if data is not None:
+        return data
+    if params is None and not video_key(url).startswith("youtube:"):
+        # Có thể là playlist: chỉ lấy đợt đầu -> thời gian tới bài đầu không phụ thuộc độ dài playlist
+        params = {"playlist_items": f"1:{PLAYLIST_FIRST_BATCH}"}
+    # shield: huỷ 1 bên chờ (vd. prefetch khi ?stop) không huỷ job dùng chung với guild khác
+    data = await asyncio.shield(extractor.submit(url, guild_id, priority, params))
+    if "entries" in data:
+        data["entries"] = [e for e in data["entries"] if e]
+        for entry in data["entries"]:
+            extract_cache.put(entry.get("webpage_url") or entry["url"], entry)
+    else:
+        extract_cache.put(url, data)
+    return data
+
+# Playlist mở theo đợt: đợt đầu PLAYLIST_FIRST_BATCH bài để phát ngay, phần còn lại lấy ở nền
+PLAYLIST_FIRST_BATCH = int(os.getenv("PLAYLIST_FIRST_BATCH", "25"))
+
+async def expand_playlist_rest(player, first, track):
+    """Playlist dài hơn đợt đầu -> lấy phần còn lại (flat, chạy nền) rồi nối vào hàng đợi."""
+    if len(first["entries"]) < PLAYLIST_FIRST_BATCH or first.get("_type") != "playlist" \
+            or first.get("extractor_key", "").startswith("YoutubeSearch"):
+        return
+    try:
+        data = await extract(track.url, player.guild.id, priority=False,
+                             params={"playlist_items": f"{PLAYLIST_FIRST_BATCH + 1}:"})
+    except asyncio.CancelledError:
+        return  # ?stop trong lúc đang lấy
+    except Exception as e:
+        print(f"Lỗi lấy phần còn lại của playlist {track.url}: {e}")
+        return
+    entries = data.get("entries") or []
+    if entries:
+        player.send("append", [Track.from_entry(entry, track.requester) for entry in entries],
+                    f"📜 Đã thêm {len(entries)} bài hát còn lại của danh sách phát vào hàng đợi!")
+
+# Bài trong songs.json được mã hoá sẵn thành Ogg/Opus trên đĩa (tối đa AUDIO_CACHE_MAX_MB, 0 = tắt);
+# volume trong ffmpeg_options được áp lúc mã hoá nên lúc phát chỉ cần đọc packet, không cần FFmpeg
+audio_cache = AudioCache(os.getenv("AUDIO_CACHE_DIR", "audio_cache"),
+                         max_bytes=int(os.getenv("AUDIO_CACHE_MAX_MB", "1024")) * 2 ** 20,
+                         audio_filter=AUDIO_FILTER)
+print(f"Audio cache: nạp {audio_cache.load()} bài từ đĩa")
+
+def save_audio_cache():
+    try:
+        audio_cache.save()
+    except OSError as e:
+        print(f"Lỗi lưu audio cache: {e}")
+
+async def resolve_track(url, guild_id=0, priority=True):
+    """Như extract() nhưng bài đã có trong audio cache thì phát từ file (không gọi mạng)."""
+    cached = audio_cache.lookup(url)
+    if cached is not None:
+        return cached
+    return await extract(url, guild_id, priority)
+
+async def _extract_background(url):
+    return await extract(url, priority=False)
+
+async def warm_song(name, url):
+    """Mã hoá 1 bài của songs.json vào audio cache (chạy nền, lỗi chỉ in log)."""
+    try:
+        await audio_cache.warm(url, _extract_background, title=name)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Audio cache: lỗi mã hoá {name} ({url}): {e}")
+
+_warm_tasks = set()
+
+def warm_library():
+    """Warm lần lượt cả songs.json ở nền (bài đã cache thì bỏ qua ngay)."""
+    if not audio_cache.enabled:
+        return
+    async def run():
+        for name, url in list(songs.items()):
+            await warm_song(name, url)
+    spawn_warm(run())
+
+def spawn_warm(coro):
+    task = asyncio.ensure_future(coro)
+    _warm_tasks.add(task)  # giữ tham chiếu để task không bị gc giữa chừng
+    task.add_done_callback(_warm_tasks.discard)
+
+def make_source(data, start=0):
+    """Nguồn FFmpeg cho link stream; start > 0 -> tua tới giây đó (phát tiếp sau khi khởi động lại).
+    Bài lấy từ audio cache ("path") -> đọc thẳng packet Opus từ file."""
+    if "path" in data:
+        return OpusFileSource(data["path"], start)
+    options = dict(ffmpeg_options)
+    if start:
+        options['before_options'] = f"-ss {start:.1f} " + options['before_options']
+    return discord.FFmpegOpusAudio(data['url'], **options)
+
+# Resolve trước PREFETCH_DEPTH bài đầu hàng đợi; mở sẵn FFmpeg cho bài kế khi bài hiện tại còn PREFETCH_WARM_LEAD giây
+prefetcher = Prefetcher(resolve_track, make_source,
+                        depth=int(os.getenv("PREFETCH_DEPTH", "2")),
+                        warm_lead=float(os.getenv("PREFETCH_WARM_LEAD", "15")))
+
+# Mỗi guild 1 actor phát nhạc; chỉ actor mới mở FFmpeg và chuyển bài
+players = {}  # guild_id -> GuildPlayer
+
+def get_player(guild):
+    player = players.get(guild.id)
+    if player is None:
+        player = players[guild.id] = GuildPlayer(guild, get_queue(guild.id), resolve_track, make_source, prefetcher,
+                                                 extractor.cancel_guild, expand_playlist_rest)
+    return player
+
+def load_songs():
+    try:
+        with open("songs.json", "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    
+def save_songs():
+    """Lưu danh sách bài hát vào songs.json"""
+    with open("songs.json", "w", encoding="utf-8") as file:
+        json.dump(songs, file, ensure_ascii=False, indent=4)
+
+songs = load_songs()
+
+# Tùy chọn: rời kênh voice (xoá hàng đợi như ?stop) sau IDLE_DISCONNECT giây không phát gì /
+# không còn ai nghe. Mặc định 0 = tắt, bot chỉ rời kênh khi có lệnh
+IDLE_DISCONNECT = int(os.getenv("IDLE_DISCONNECT", "0"))
+idle_since = {}  # guild_id -> monotonic lúc bắt đầu rảnh
+
+def cleanup_idle(bot):
+    """Dọn tài nguyên không còn dùng (chạy định kỳ)."""
+    now = time.monotonic()
+    if IDLE_DISCONNECT > 0:
+        for voice_client in list(bot.voice_clients):
+            guild = voice_client.guild
+            player = players.get(guild.id)
+            listening = any(not member.bot for member in voice_client.channel.members)
+            if listening and player is not None and player.busy:
+                idle_since.pop(guild.id, None)
+                continue
+            if now - idle_since.setdefault(guild.id, now) >= IDLE_DISCONNECT:
+                print(f"Rời kênh voice không dùng ({guild.name})")
+                get_player(guild).send("stop")
+                idle_since.pop(guild.id, None)
+
+    for guild_id, player in list(players.items()):
+        if player.voice is not None:
+            continue
+        # Không còn ở kênh voice: bỏ FFmpeg đã warm / prefetch đang chạy
+        prefetcher.clear(guild_id)
+        if player.queue.current is None and not player.queue and not player.busy:
+            player.close()
+            del players[guild_id]
+            queues.pop(guild_id, None)
+            idle_since.pop(guild_id, None)
+
+    for guild_id, voice_client in list(voice_clients.items()):
+        if not voice_client.is_connected():
+            del voice_clients[guild_id]
+    extract_cache.purge_expired()
+
+def nightly_cleanup(bot):
+    """Dọn sâu hằng đêm, thay cho os.execv: không rớt kết nối voice / gateway."""
+    cleanup_idle(bot)
+    extractor.recycle()
+    save_extract_cache()
+    save_audio_cache()
+    save_playback_state()
+    warm_library()  # bài bị LRU đẩy ra / lần warm trước lỗi
+    print(f"Dọn dẹp hằng đêm: gc thu hồi {gc.collect()} object, {len(players)} player, "
+          f"{len(extract_cache)} bài trong extract cache, {len(audio_cache)} bài trong audio cache "
+          f"({audio_cache.total_bytes / 2 ** 20:.0f} MiB)")
@@ -0,0 +1,162 @@
+# extract_cache.py
+"""
+Cache kết quả yt-dlp extract_info (metadata + link stream), key theo ID video chuẩn hoá:
+- https://youtu.be/ID?si=..., youtube.com/watch?v=ID, /shorts/ID, music.youtube... -> "youtube:ID"
+- TTL lấy từ tham số `expire` trong link stream đã ký (googlevideo), trừ hao SAFETY_MARGIN
+- Đầy -> bỏ entry dùng lâu nhất (LRU)
+- Tuỳ chọn lưu xuống file JSON để bài trong songs.json vẫn "nóng" sau khi khởi động lại
+Cache hit -> phát ngay, không gọi mạng để extract.
+"""
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 30 * 60  # link không có `expire` (SoundCloud, file trực tiếp...)
+SAFETY_MARGIN = 10 * 60  # bỏ sớm để bài dài không hết hạn giữa chừng
+
+# Chỉ giữ các trường bot cần; toàn bộ info của yt-dlp (formats, thumbnails...) nặng hàng trăm KB
+KEEP_FIELDS = ("id", "title", "url", "duration", "webpage_url", "extractor_key", "http_headers")
+
+_YT_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com",
+             "www.youtube-nocookie.com")
+_YT_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YT_PATH = re.compile(r"^/(?:shorts|embed|live|v)/([A-Za-z0-9_-]{11})")
+_EXPIRE_PATH = re.compile(r"/expire/(\d+)")
+
+
+def video_key(url: str) -> str:
+    """Key chuẩn cho URL/truy vấn người dùng nhập (không gọi mạng)."""
+    url = url.strip()
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host == "youtu.be":
+        vid = parsed.path.lstrip("/").split("/")[0]
+        if _YT_ID.match(vid):
+            return f"youtube:{vid}"
+    elif host in _YT_HOSTS and "list" not in parse_qs(parsed.query):  # watch?v=..&list=.. là playlist
+        vid = parse_qs(parsed.query).get("v", [""])[0]
+        if _YT_ID.match(vid):
+            return f"youtube:{vid}"
+        m = _YT_PATH.match(parsed.path)
+        if m:
+            return f"youtube:{m.group(1)}"
+    if parsed.scheme in ("http", "https"):
+        # URL khác: bỏ fragment, giữ query (có thể là một phần định danh)
+        return parsed._replace(fragment="").geturl()
+    return f"search:{url.lower()}"
+
+
+def info_key(info: dict) -> Optional[str]:
+    """Key từ kết quả extract (vd. entry của playlist/ytsearch)."""
+    if info.get("extractor_key") == "Youtube" and info.get("id"):
+        return f"youtube:{info['id']}"
+    page = info.get("webpage_url")
+    return video_key(page) if page else None
+
+
+def stream_expiry(stream_url: str, now: float) -> float:
+    """Thời điểm (epoch) nên coi link stream là hết hạn."""
+    parsed = urlparse(stream_url)
+    raw = parse_qs(parsed.query).get("expire", [None])[0]
+    if raw is None:
+        m = _EXPIRE_PATH.search(parsed.path)
+        raw = m.group(1) if m else None
+    try:
+        return float(raw) - SAFETY_MARGIN
+    except (TypeError, ValueError):
+        return now + DEFAULT_TTL
+
+
+class ExtractCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._data: OrderedDict[str, dict] = OrderedDict()  # key -> {"info": ..., "expires": ...}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, url: str, now: Optional[float] = None) -> Optional[dict]:
+        """Info đã cache của `url` (URL gốc người dùng nhập hoặc URL trang), None nếu chưa có/hết hạn."""
+        return self.get_key(video_key(url), now)
+
+    def get_key(self, key: str, now: Optional[float] = None) -> Optional[dict]:
+        now = time.time() if now is None else now
+        item = self._data.get(key)
+        if item is None or item["expires"] <= now:
+            if item is not None:
+                del self._data[key]
+                self._dirty = True
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item["info"]
+
+    def put(self, url: str, info: dict, now: Optional[float] = None) -> Optional[dict]:
+        """Lưu info của 1 video đã resolve (không phải playlist / entry flat). Trả về bản rút gọn đã lưu."""
+        if "entries" in info or info.get("_type") == "url" or not info.get("url"):
+            return None
+        now = time.time() if now is None else now
+        slim = {k: info[k] for k in KEEP_FIELDS if info.get(k) is not None}
+        expires = stream_expiry(slim["url"], now)
+        if expires <= now:
+            return slim
+        item = {"info": slim, "expires": expires}
+        keys = {video_key(url)}
+        own = info_key(info)
+        if own:
+            keys.add(own)  # vd. "?play <tên>" (ytsearch) và "?play <url>" trỏ cùng 1 entry
+        for key in keys:
+            self._data[key] = item
+            self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        self._dirty = True
+        return slim
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        stale = [k for k, item in self._data.items() if item["expires"] <= now]
+        for k in stale:
+            del self._data[k]
+        if stale:
+            self._dirty = True
+        return len(stale)
+
+    # ----------------------------------------------------------------- disk
+
+    def load(self) -> int:
+        if not self.path:
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                raw = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        now = time.time()
+        for key, item in raw.items():
+            if isinstance(item, dict) and item.get("expires", 0) > now and "info" in item:
+                self._data[key] = item
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        return len(self._data)
+
+    def save(self) -> None:
+        """Ghi file (atomic) nếu có thay đổi kể từ lần ghi trước."""
+        if not self.path or not self._dirty:
+            return
+        self.purge_expired()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(self._data, file, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
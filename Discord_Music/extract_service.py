@@ -0,0 +1,209 @@
+# extract_service.py
+"""
+Dịch vụ extract yt-dlp riêng (không dùng chung default executor của event loop):
+- Pool giới hạn `workers` thread hoặc process, mỗi worker 1 YoutubeDL riêng (YoutubeDL không thread-safe)
+- Chia lượt round-robin giữa các guild: 1 người thả playlist 500 bài không chặn server khác
+- Job ưu tiên (bài sắp phát / người dùng đang chờ) được chạy trước mọi job nền
+- Cùng 1 video đang chờ/đang chạy -> dùng chung 1 job (nhiều guild có thể cùng chờ)
+- cancel_guild(): ?stop -> bỏ các job chờ chỉ guild đó cần; job đang chạy thì kết quả bị bỏ
+- `params` ghi đè option yt-dlp cho riêng 1 lần gọi (vd. playlist_items để mở playlist theo từng đợt)
+
+Không đặt tên module là extractor.py: yt-dlp nạp plugin kiểu cũ vào sys.modules["extractor"],
+worker process (mode="process") sẽ không unpickle được _extract từ job thứ 2 trở đi.
+"""
+import asyncio
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import yt_dlp
+
+from extract_cache import video_key
+
+_local = threading.local()
+_options: Optional[dict] = None
+
+
+def _init_worker(options: dict) -> None:
+    global _options
+    _options = options
+
+
+def _extract(url: str, params: Optional[dict] = None) -> dict:
+    """Chạy trong worker (thread hoặc process)."""
+    ytdl = getattr(_local, "ytdl", None)
+    if ytdl is None:
+        ytdl = _local.ytdl = yt_dlp.YoutubeDL(_options)
+    saved = {k: ytdl.params.get(k) for k in params or ()}
+    ytdl.params.update(params or {})  # instance riêng của worker -> sửa tạm không ảnh hưởng ai
+    try:
+        info = ytdl.extract_info(url, download=False)
+    finally:
+        ytdl.params.update(saved)
+    # Bỏ object không pickle/JSON được (process pool + extract cache trên đĩa)
+    return ytdl.sanitize_info(info)
+
+
+class _Job:
+    __slots__ = ("key", "url", "params", "future", "guilds", "priority", "state")
+
+    def __init__(self, key: str, url: str, params: Optional[dict], future: asyncio.Future, guild_id: int,
+                 priority: bool):
+        self.key = key
+        self.url = url
+        self.params = params
+        self.future = future
+        self.guilds = {guild_id}
+        self.priority = priority
+        self.state = "pending"  # pending | running | cancelled
+
+
+class ExtractionService:
+    def __init__(self, options: dict, workers: int = 2, mode: str = "thread", start_method: Optional[str] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown extraction mode: {mode}")
+        self.options = options
+        self.workers = max(1, workers)
+        self.mode = mode
+        # mode="process": fork | spawn | forkserver, None = mặc định của hệ điều hành (Windows: spawn).
+        # Worker chỉ cần module này (+ yt_dlp); spawn/forkserver import lại __main__ -> bot.py phải có guard
+        self.start_method = start_method
+        self._pool = None
+        self._runners: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pending: dict[str, _Job] = {}
+        self._running: dict[str, _Job] = {}
+        self._urgent: deque[_Job] = deque()
+        self._by_guild: dict[int, deque[_Job]] = {}
+        self._rotation: deque[int] = deque()  # guild có job nền đang chờ, theo vòng
+
+    def start(self) -> None:
+        if self._runners:
+            return
+        self._pool = self._new_pool()
+        self._wakeup = asyncio.Event()
+        self._runners = [asyncio.ensure_future(self._run()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in self._runners:
+            task.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        for job in list(self._pending.values()) + list(self._running.values()):
+            job.future.cancel()
+        self._pending.clear()
+        self._running.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _new_pool(self):
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.options,),
+                                       mp_context=multiprocessing.get_context(self.start_method))
+        return ThreadPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.options,))
+
+    def recycle(self) -> None:
+        """Thay pool mới (YoutubeDL mới cho mỗi worker); job đang chạy ở pool cũ vẫn chạy xong."""
+        if self._pool is None:
+            return
+        old = self._pool
+        self._pool = self._new_pool()
+        old.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "running": len(self._running),
+                "guilds": len(self._by_guild)}
+
+    def submit(self, url: str, guild_id: int = 0, priority: bool = False,
+               params: Optional[dict] = None) -> asyncio.Future:
+        """Future kết quả extract_info(url). Người chờ nên `await asyncio.shield(fut)`."""
+        self.start()
+        key = video_key(url)
+        if params:
+            key += "|" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        job = self._pending.get(key) or self._running.get(key)
+        if job is not None and not job.future.cancelled():
+            job.guilds.add(guild_id)
+            if priority and not job.priority and job.state == "pending":
+                job.priority = True
+                self._urgent.append(job)  # bản trong hàng của guild bị bỏ qua khi tới lượt
+                self._wakeup.set()
+            return job.future
+
+        job = _Job(key, url, params, asyncio.get_running_loop().create_future(), guild_id, priority)
+        self._pending[key] = job
+        if priority:
+            self._urgent.append(job)
+        else:
+            queue = self._by_guild.get(guild_id)
+            if queue is None:
+                queue = self._by_guild[guild_id] = deque()
+                self._rotation.append(guild_id)
+            queue.append(job)
+        self._wakeup.set()
+        return job.future
+
+    def cancel_guild(self, guild_id: int) -> int:
+        """Bỏ mọi job chỉ `guild_id` cần. Trả về số job bị huỷ."""
+        cancelled = 0
+        for jobs in (self._pending, self._running):
+            for key, job in list(jobs.items()):
+                job.guilds.discard(guild_id)
+                if job.guilds:
+                    continue
+                job.future.cancel()
+                if job.state == "pending":
+                    job.state = "cancelled"
+                    del jobs[key]
+                cancelled += 1
+        return cancelled
+
+    def _next_job(self) -> Optional[_Job]:
+        while self._urgent:
+            job = self._urgent.popleft()
+            if job.state == "pending":
+                return job
+        while self._rotation:
+            guild_id = self._rotation.popleft()
+            queue = self._by_guild[guild_id]
+            job = None
+            while queue:
+                candidate = queue.popleft()
+                if candidate.state == "pending":
+                    job = candidate
+                    break
+            if queue:
+                self._rotation.append(guild_id)
+            else:
+                del self._by_guild[guild_id]
+            if job is not None:
+                return job
+        return None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job.state = "running"
+            del self._pending[job.key]
+            self._running[job.key] = job
+            try:
+                result = await loop.run_in_executor(self._pool, _extract, job.url, job.params)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                if self._running.get(job.key) is job:
+                    del self._running[job.key]
@@ -0,0 +1,163 @@
+# music_queue.py
+"""
+Hàng đợi nhạc theo guild:
+- Track: bản ghi gọn (__slots__) gồm url, tiêu đề, độ dài, người yêu cầu
+- GuildQueue: deque -> lấy bài kế O(1); shuffle / move / remove theo số thứ tự;
+  history các bài đã phát; loop mode off | track | queue
+- Tổng thời lượng được cộng dồn khi thêm/bớt -> ?queue không phải duyệt cả hàng đợi
+"""
+import random
+from collections import deque
+from itertools import islice
+from typing import Iterable, Optional
+
+LOOP_OFF = "off"
+LOOP_TRACK = "track"
+LOOP_QUEUE = "queue"
+LOOP_MODES = (LOOP_OFF, LOOP_TRACK, LOOP_QUEUE)
+
+HISTORY_SIZE = 50
+
+
+class Track:
+    __slots__ = ("url", "title", "duration", "requester")
+
+    def __init__(self, url: str, title: Optional[str] = None, duration: Optional[float] = None,
+                 requester: Optional[str] = None):
+        self.url = url
+        self.title = title
+        self.duration = duration
+        self.requester = requester
+
+    @classmethod
+    def from_entry(cls, entry: dict, requester: Optional[str] = None) -> "Track":
+        """Từ entry yt-dlp (flat hoặc đã resolve); URL trang không hết hạn."""
+        return cls(entry.get("webpage_url") or entry["url"], entry.get("title"), entry.get("duration"), requester)
+
+    @property
+    def label(self) -> str:
+        return self.title or self.url
+
+    def __repr__(self) -> str:
+        return f"Track({self.label!r})"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?:??"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class GuildQueue:
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._items: deque[Track] = deque()
+        self.history: deque[Track] = deque(maxlen=history_size)
+        self.current: Optional[Track] = None
+        self.loop = LOOP_OFF
+        self._duration = 0.0  # tổng độ dài các bài đang chờ (bài không rõ độ dài tính 0)
+        self._unknown = 0  # số bài chưa rõ độ dài
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def _count(self, track: Track, sign: int) -> None:
+        if track.duration is None:
+            self._unknown += sign
+        else:
+            self._duration += sign * track.duration
+
+    @property
+    def total_duration(self) -> float:
+        return self._duration
+
+    @property
+    def unknown_durations(self) -> int:
+        return self._unknown
+
+    def push(self, track: Track) -> None:
+        self._items.append(track)
+        self._count(track, 1)
+
+    def extend(self, tracks: Iterable[Track]) -> int:
+        n = 0
+        for track in tracks:
+            self.push(track)
+            n += 1
+        return n
+
+    def extend_front(self, tracks: Iterable[Track]) -> int:
+        """Chèn các bài lên đầu hàng đợi, giữ nguyên thứ tự của chúng."""
+        tracks = list(tracks)
+        self._items.extendleft(reversed(tracks))
+        for track in tracks:
+            self._count(track, 1)
+        return len(tracks)
+
+    def peek(self, n: int = 1) -> list[Track]:
+        return list(islice(self._items, n))
+
+    def upcoming(self, n: int = 1) -> list[Track]:
+        """Các bài sẽ phát tiếp theo, có tính loop mode (để prefetch)."""
+        if self.loop == LOOP_TRACK and self.current is not None:
+            return [self.current]
+        tracks = self.peek(n)
+        if self.loop == LOOP_QUEUE and self.current is not None and len(tracks) < n:
+            tracks.append(self.current)
+        return tracks
+
+    def page(self, start: int, size: int) -> list[Track]:
+        return list(islice(self._items, start, start + size))
+
+    def advance(self, skip: bool = False) -> Optional[Track]:
+        """
+        Chuyển sang bài kế tiếp theo loop mode và trả về nó (None = hết hàng đợi).
+        skip=True: ?skip luôn bỏ bài hiện tại kể cả khi đang lặp 1 bài.
+        """
+        finished = self.current
+        if finished is not None:
+            if self.loop == LOOP_TRACK and not skip:
+                return finished
+            self.history.append(finished)
+            if self.loop == LOOP_QUEUE:
+                self.push(finished)
+        if self._items:
+            self.current = self._items.popleft()
+            self._count(self.current, -1)
+        else:
+            self.current = None
+        return self.current
+
+    def remove(self, index: int) -> Track:
+        """Bỏ bài thứ `index` (0 = bài kế tiếp). IndexError nếu không có."""
+        track = self._items[index]
+        del self._items[index]
+        self._count(track, -1)
+        return track
+
+    def move(self, src: int, dst: int) -> Track:
+        """Chuyển bài thứ `src` tới vị trí `dst` (đếm từ 0, sau khi đã gỡ khỏi chỗ cũ)."""
+        track = self._items[src]
+        del self._items[src]
+        self._items.insert(max(0, min(dst, len(self._items))), track)
+        return track
+
+    def shuffle(self) -> None:
+        items = list(self._items)
+        random.shuffle(items)
+        self._items = deque(items)
+
+    def clear(self) -> None:
+        """Xoá hàng đợi và bài đang phát (giữ history)."""
+        self._items.clear()
+        self.current = None
+        self._duration = 0.0
+        self._unknown = 0
@@ -0,0 +1,78 @@
+# playback_state.py
+"""
+Lưu / khôi phục trạng thái phát nhạc qua các lần khởi động lại (?restart, restart hằng đêm):
+- Mỗi guild: kênh voice + kênh text, loop mode, bài đang phát + vị trí (giây), hàng đợi
+- Track lưu dạng list gọn [url, title, duration, requester]; không lưu link stream (sẽ hết hạn)
+  -> lúc khôi phục chỉ bài đang dở được resolve ngay, phần còn lại resolve dần qua prefetch
+- Ghi atomic (file tạm + os.replace) để tắt ngang không làm hỏng file
+"""
+import json
+import os
+import time
+from typing import Optional
+
+from music_queue import LOOP_MODES, GuildQueue, Track
+
+STATE_VERSION = 1
+MAX_AGE = 6 * 3600  # trạng thái cũ hơn thế (bot tắt lâu) thì bỏ qua
+
+
+def _track_row(track: Track) -> list:
+    return [track.url, track.title, track.duration, track.requester]
+
+
+def _track_from_row(row) -> Track:
+    return Track(*row[:4])
+
+
+def snapshot(player) -> Optional[dict]:
+    """Trạng thái 1 guild, None nếu không có gì để lưu (không ở kênh voice / không có bài)."""
+    voice = player.voice
+    queue = player.queue
+    if voice is None or not voice.is_connected() or (queue.current is None and not queue):
+        return None
+    return {
+        "voice_channel": voice.channel.id,
+        "text_channel": player.channel.id if player.channel is not None else None,
+        "loop": queue.loop,
+        "current": _track_row(queue.current) if queue.current is not None else None,
+        "position": player.position() or 0.0,
+        "queue": [_track_row(track) for track in queue],
+    }
+
+
+def save_state(path: str, players) -> int:
+    """Ghi trạng thái mọi guild đang phát. Trả về số guild đã lưu."""
+    guilds = {}
+    for guild_id, player in players.items():
+        state = snapshot(player)
+        if state is not None:
+            guilds[str(guild_id)] = state
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump({"version": STATE_VERSION, "saved_at": time.time(), "guilds": guilds}, file,
+                  ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return len(guilds)
+
+
+def load_state(path: str) -> dict:
+    """{guild_id: state} từ file; rỗng nếu không có, hỏng hoặc quá cũ."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            raw = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if raw.get("version") != STATE_VERSION or time.time() - raw.get("saved_at", 0) > MAX_AGE:
+        return {}
+    return {int(guild_id): state for guild_id, state in raw.get("guilds", {}).items()}
+
+
+def restore_queue(queue: GuildQueue, state: dict) -> Optional[Track]:
+    """Nạp hàng đợi + loop mode vào `queue`; trả về bài đang dở (nếu có)."""
+    queue.clear()
+    if state.get("loop") in LOOP_MODES:
+        queue.loop = state["loop"]
+    queue.extend(_track_from_row(row) for row in state.get("queue", ()))
+    current = state.get("current")
+    return _track_from_row(current) if current else None
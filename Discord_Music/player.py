@@ -0,0 +1,266 @@
+# player.py
+"""
+Actor phát nhạc cho từng guild: 1 task asyncio sống lâu đọc lệnh từ mailbox.
+Chỉ task này được mở nguồn FFmpeg, gọi voice_client.play()/stop() và chuyển bài trong hàng đợi;
+lệnh chat (?play/?skip/?stop...) và callback `after=` (thread audio) chỉ gửi tin vào mailbox.
+
+- Mỗi lần đổi bài tăng `generation`; tin "ended"/"loaded" mang generation cũ bị bỏ qua
+  -> ?skip gọi stop() không kéo thêm 1 lần chuyển bài từ callback (trước đây bị nhảy 2 bài)
+- Resolve bài chạy ở task riêng rồi báo "loaded" về mailbox -> actor không bị chặn trong lúc extract,
+  ?stop/?skip vẫn được xử lý ngay
+- position() = số giây đã phát của bài hiện tại (trừ thời gian tạm dừng) -> lưu lại khi khởi động lại,
+  "restore" phát tiếp từ đúng vị trí đó
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from music_queue import GuildQueue, Track, format_duration
+
+
+class GuildPlayer:
+    def __init__(self, guild, queue: GuildQueue, resolve: Callable[..., Awaitable[dict]],
+                 make_source: Callable[..., object], prefetcher, cancel_jobs: Callable[[int], object],
+                 expand_rest: Callable[["GuildPlayer", dict, Track], Awaitable[None]]):
+        self.guild = guild
+        self.queue = queue
+        self.resolve = resolve
+        self.make_source = make_source
+        self.prefetcher = prefetcher
+        self.cancel_jobs = cancel_jobs
+        self.expand_rest = expand_rest
+        self.channel = None  # kênh text để báo "Đang phát"... (kênh của lệnh gần nhất)
+        self.generation = 0
+        self.started_at: Optional[float] = None  # monotonic lúc bắt đầu bài hiện tại (đã tính vị trí tua tới)
+        self._paused_at: Optional[float] = None
+        self._ended_at: Optional[float] = None  # perf_counter lúc bài trước kết thúc (đo khoảng lặng)
+        self._loading: Optional[asyncio.Task] = None
+        self._background: set[asyncio.Task] = set()
+        self._mailbox: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.handled = 0
+
+    # ---------------------------------------------------------------- API (gọi từ lệnh chat)
+
+    def send(self, kind: str, *args) -> None:
+        """Gửi tin vào mailbox (chỉ gọi từ event loop)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        self._mailbox.put_nowait((kind, args))
+
+    @property
+    def voice(self):
+        return self.guild.voice_client
+
+    @property
+    def busy(self) -> bool:
+        """Đang phát / tạm dừng / đang resolve bài."""
+        voice = self.voice
+        return self._loading is not None or bool(voice and (voice.is_playing() or voice.is_paused()))
+
+    def position(self) -> Optional[float]:
+        """Số giây đã phát của bài hiện tại, None nếu không phát gì."""
+        if self.started_at is None:
+            return None
+        return (self._paused_at or time.monotonic()) - self.started_at
+
+    def remaining(self) -> Optional[float]:
+        """Số giây còn lại (ước lượng) của bài đang phát, None nếu không biết."""
+        track = self.queue.current
+        position = self.position()
+        if position is None or track is None or track.duration is None:
+            return None
+        return max(0.0, track.duration - position)
+
+    def prefetch(self) -> None:
+        """Chuẩn bị trước các bài sắp phát (gọi lại sau khi hàng đợi đổi thứ tự)."""
+        upcoming = [track.url for track in self.queue.upcoming(self.prefetcher.depth)]
+        if not upcoming:
+            return
+        self.prefetcher.prefetch(self.guild.id, upcoming)
+        remaining = self.remaining()
+        if remaining is not None:
+            self.prefetcher.warm_later(self.guild.id, upcoming[0], remaining)
+
+    def close(self) -> None:
+        """Dừng actor + task nền (player không còn dùng)."""
+        for task in [self._task, self._loading, *self._background]:
+            if task is not None:
+                task.cancel()
+        self._task = self._loading = None
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Task nền gắn với player, bị huỷ khi ?stop."""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def notify(self, text: str) -> None:
+        if self.channel is not None:
+            self.spawn(self._notify(text))
+
+    async def _notify(self, text: str) -> None:
+        try:
+            await self.channel.send(text)
+        except Exception as e:
+            print(f"Lỗi gửi tin nhắn ({self.guild.name}): {e}")
+
+    # ---------------------------------------------------------------- actor
+
+    async def _run(self) -> None:
+        while True:
+            kind, args = await self._mailbox.get()
+            self.handled += 1
+            try:
+                await getattr(self, f"_on_{kind}")(*args)
+            except Exception as e:
+                print(f"Lỗi player ({self.guild.name}, {kind}): {e}")
+
+    async def _on_enqueue(self, tracks: list[Track]) -> None:
+        was_empty = not self.queue
+        self.queue.extend(tracks)
+        if not self.busy:
+            self._start_next()
+            return
+        if len(tracks) == 1:
+            self.notify(f"🎶 Đã thêm vào hàng đợi! (vị trí {len(self.queue)})")
+        else:
+            self.notify(f"🎶 Đã thêm {len(tracks)} bài hát vào hàng đợi!")
+        if was_empty:
+            self.prefetch()
+
+    async def _on_append(self, tracks: list[Track], message: str) -> None:
+        """Bài thêm từ nền (phần còn lại của playlist)."""
+        self.queue.extend(tracks)
+        self.notify(message)
+        if not self.busy:
+            self._start_next()
+
+    async def _on_ended(self, generation: int, error) -> None:
+        if error:
+            print(f"Lỗi phát nhạc ({self.guild.name}): {error}")
+        if generation != self.generation:
+            return  # bài đã bị ?skip/?stop thay thế
+        self._ended_at = time.perf_counter()
+        self._start_next()
+
+    async def _on_start(self) -> None:
+        """Bắt đầu phát hàng đợi nếu đang rảnh (sau khi khôi phục)."""
+        if not self.busy:
+            self._start_next()
+
+    async def _on_pause(self) -> None:
+        voice = self.voice
+        if voice and voice.is_playing():
+            voice.pause()
+            self._paused_at = time.monotonic()
+
+    async def _on_resume(self) -> None:
+        voice = self.voice
+        if voice and voice.is_paused():
+            voice.resume()
+            if self._paused_at is not None and self.started_at is not None:
+                self.started_at += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    async def _on_restore(self, track: Track, position: float) -> None:
+        """Phát lại bài đang dở trước khi khởi động lại, từ giây thứ `position`."""
+        if self.busy:
+            return
+        self.generation += 1
+        self.queue.current = track
+        self._loading = asyncio.ensure_future(self._load(self.generation, track, position))
+
+    async def _on_skip(self) -> None:
+        self._start_next(skip=True)
+
+    async def _on_stop(self) -> None:
+        self.generation += 1
+        self.queue.clear()
+        self.started_at = None
+        self._paused_at = None
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+        for task in list(self._background):
+            task.cancel()
+        self.prefetcher.clear(self.guild.id)
+        self.cancel_jobs(self.guild.id)
+        voice = self.voice
+        if voice and voice.is_connected():
+            voice.stop()
+            await voice.disconnect()
+
+    async def _on_loaded(self, generation: int, track: Track, data: Optional[dict], error,
+                         start: float = 0.0) -> None:
+        if generation != self.generation:
+            return
+        self._loading = None
+        if error is not None or data is None:
+            print(f"Không thể phát {track.url}: {error}")
+            self.notify(f"❌ Không thể phát: {track.label}")
+            self.queue.current = None  # bỏ hẳn bài lỗi (không lặp lại, không vào history)
+            self._start_next()
+            return
+
+        if "entries" in data:
+            # URL là playlist/tìm kiếm -> đặt các bài vào đầu hàng đợi, bỏ bản ghi playlist
+            entries = data["entries"]
+            self.queue.current = None
+            self.queue.extend_front(Track.from_entry(entry, track.requester) for entry in entries)
+            if len(entries) > 1:  # ytsearch cũng trả về dạng danh sách 1 bài
+                self.notify(f"📜 Đã thêm {len(entries)} bài hát từ danh sách phát vào hàng đợi!")
+            self.spawn(self.expand_rest(self, data, track))
+            self._start_next()
+            return
+
+        voice = self.voice
+        if voice is None or not voice.is_connected():
+            return
+        track.title = data.get("title") or track.title
+        track.duration = data.get("duration")
+        if start:
+            source = self.make_source(data, start)
+        else:
+            source = self.prefetcher.take(self.guild.id, track.url) or self.make_source(data)
+        generation = self.generation
+        loop = asyncio.get_running_loop()
+        # `after` chạy ở thread audio -> chỉ chuyển tin về mailbox
+        voice.play(source, after=lambda err: loop.call_soon_threadsafe(self.send, "ended", generation, err))
+        self.started_at = time.monotonic() - start
+        self._paused_at = None
+        if self._ended_at is not None:
+            print(f"Chuyển bài ({self.guild.name}): {(time.perf_counter() - self._ended_at) * 1000:.0f} ms")
+            self._ended_at = None
+        self.prefetch()
+        if start:
+            self.notify(f"🎵 Phát tiếp: {track.label} (từ {format_duration(start)})")
+        else:
+            self.notify(f"🎵 Đang phát: {track.label}")
+
+    def _start_next(self, skip: bool = False) -> None:
+        """Dừng bài hiện tại (nếu có) và bắt đầu resolve bài kế tiếp."""
+        self.generation += 1
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+        voice = self.voice
+        if voice and (voice.is_playing() or voice.is_paused()):
+            voice.stop()  # callback `after` mang generation cũ -> bị bỏ qua
+        self.started_at = None
+        self._paused_at = None
+        track = self.queue.advance(skip=skip)
+        if track is None:
+            return
+        self._loading = asyncio.ensure_future(self._load(self.generation, track))
+
+    async def _load(self, generation: int, track: Track, start: float = 0.0) -> None:
+        try:
+            data = await self.resolve(track.url, self.guild.id, True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.send("loaded", generation, track, None, e)
+            return
+        self.send("loaded", generation, track, data, None, start)
@@ -0,0 +1,91 @@
+# prefetch.py
+"""
+Chuẩn bị trước bài kế tiếp trong lúc bài hiện tại đang phát:
+- prefetch(): resolve (extract) `depth` bài đầu hàng đợi ở nền -> kết quả nằm sẵn trong extract cache;
+  bài kế tiếp được ưu tiên, các bài sau chạy ở mức nền
+- warm_later(): `warm_lead` giây trước khi bài hiện tại hết, mở sẵn nguồn FFmpeg cho bài kế
+  (process FFmpeg đã kết nối + có dữ liệu trong pipe) -> chuyển bài gần như không có khoảng lặng
+- take(): play lấy nguồn đã warm nếu đúng bài; sai bài thì dọn đi
+- clear(): ?stop / rời kênh -> huỷ task nền + đóng process FFmpeg đã warm
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+class Prefetcher:
+    def __init__(self, resolve: Callable[[str, int, bool], Awaitable[dict]], make_source: Callable[[dict], object],
+                 depth: int = 2, warm_lead: float = 15.0):
+        self.resolve = resolve
+        self.make_source = make_source
+        self.depth = depth
+        self.warm_lead = warm_lead
+        self._tasks: dict[int, set[asyncio.Task]] = {}
+        self._warm_task: dict[int, asyncio.Task] = {}
+        self._warm: dict[int, tuple[str, object]] = {}  # guild_id -> (url, source)
+
+    def _spawn(self, guild_id: int, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        tasks = self._tasks.setdefault(guild_id, set())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def prefetch(self, guild_id: int, urls) -> None:
+        """Resolve trước tối đa `depth` URL đầu hàng đợi (resolve tự gộp các lần gọi trùng)."""
+        for i, url in enumerate(list(urls)[:self.depth]):
+            self._spawn(guild_id, self._resolve_quietly(url, guild_id, priority=i == 0))
+
+    async def _resolve_quietly(self, url: str, guild_id: int, priority: bool) -> Optional[dict]:
+        try:
+            return await self.resolve(url, guild_id, priority)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Prefetch lỗi ({url}): {e}")
+            return None
+
+    def warm_later(self, guild_id: int, url: str, duration: Optional[float]) -> None:
+        """Mở nguồn FFmpeg cho `url` khi bài hiện tại (dài `duration` giây) còn khoảng `warm_lead` giây."""
+        old = self._warm_task.pop(guild_id, None)
+        if old is not None:
+            old.cancel()
+        if self.warm_lead <= 0:
+            return
+        delay = max(0.0, (duration or 0) - self.warm_lead)
+        self._warm_task[guild_id] = self._spawn(guild_id, self._warm_after(guild_id, url, delay))
+
+    async def _warm_after(self, guild_id: int, url: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        info = await self._resolve_quietly(url, guild_id, priority=True)
+        if not info or "entries" in info:
+            return
+        self._discard_warm(guild_id)
+        self._warm[guild_id] = (url, self.make_source(info))
+
+    def take(self, guild_id: int, url: str):
+        """Nguồn đã warm cho `url`, hoặc None."""
+        warm = self._warm.pop(guild_id, None)
+        if warm is None:
+            return None
+        if warm[0] == url:
+            return warm[1]
+        _cleanup(warm[1])
+        return None
+
+    def _discard_warm(self, guild_id: int) -> None:
+        warm = self._warm.pop(guild_id, None)
+        if warm is not None:
+            _cleanup(warm[1])
+
+    def clear(self, guild_id: int) -> None:
+        for task in list(self._tasks.pop(guild_id, ())):
+            task.cancel()
+        self._warm_task.pop(guild_id, None)
+        self._discard_warm(guild_id)
+
+
+def _cleanup(source) -> None:
+    try:
+        source.cleanup()  # kill process FFmpeg
+    except Exception as e:
+        print(f"Lỗi dọn nguồn FFmpeg: {e}")
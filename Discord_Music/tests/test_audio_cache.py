@@ -0,0 +1,26 @@
+import os
+
+from audio_cache import AudioCache, INDEX_FILE
+
+
+def test_load_keeps_foreign_files(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=2 ** 20)
+    orphan = AudioCache._filename("youtube:aaaaaaaaaaa")
+    for name in ("bot.py", "songs.json", ".env", "notes.ogg", orphan, orphan + ".part"):
+        (tmp_path / name).write_text("x")
+
+    assert cache.load() == 0
+    assert sorted(os.listdir(tmp_path)) == [".env", "bot.py", "notes.ogg", "songs.json"]
+
+
+def test_load_keeps_indexed_files(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=2 ** 20)
+    filename = AudioCache._filename("youtube:bbbbbbbbbbb")
+    (tmp_path / filename).write_bytes(b"x" * 10)
+    cache._add("youtube:bbbbbbbbbbb", {"file": filename, "size": 10, "title": "b", "duration": 1})
+    cache.save()
+
+    reloaded = AudioCache(str(tmp_path), max_bytes=2 ** 20)
+    assert reloaded.load() == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([filename, INDEX_FILE])
+    assert reloaded.lookup("https://youtu.be/bbbbbbbbbbb")["path"] == os.path.join(str(tmp_path), filename)
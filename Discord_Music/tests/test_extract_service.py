@@ -0,0 +1,55 @@
+import asyncio
+import os
+import subprocess
+import sys
+import wave
+
+from extract_service import ExtractionService
+
+MUSIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _worker_modules():
+    """Chạy trong worker: module nặng của bot không được nạp."""
+    return sorted(name for name in ("core", "bot", "__mp_main__") if name in sys.modules)
+
+
+def _make_wav(path):
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(8000)
+        file.writeframes(b"\0\0" * 800)
+
+
+def test_process_pool_with_spawn(tmp_path):
+    path = tmp_path / "tone.wav"
+    _make_wav(str(path))
+    url = path.as_uri()
+
+    async def run():
+        service = ExtractionService({"quiet": True, "enable_file_urls": True}, workers=1, mode="process",
+                                    start_method="spawn")
+        try:
+            info = await service.submit(url)
+            # job thứ 2 trên cùng worker (YoutubeDL đã tạo, plugin yt-dlp đã nạp)
+            again = await service.submit(url, params={"noplaylist": True})
+            modules = await asyncio.get_running_loop().run_in_executor(service._pool, _worker_modules)
+        finally:
+            await service.close()
+        return info, again, modules
+
+    info, again, modules = asyncio.run(run())
+    assert info["url"] == url and again["url"] == url
+    assert "core" not in modules and "bot" not in modules
+
+
+def test_bot_module_reimport_has_no_side_effects():
+    # spawn/forkserver chạy lại file main của process cha dưới tên __mp_main__
+    code = ("import runpy, sys; runpy.run_path('bot.py', run_name='__mp_main__'); "
+            "print(sorted(m for m in ('core', 'cogs.admin') if m in sys.modules))")
+    env = {**os.environ, "BOT_TOKEN": ""}
+    result = subprocess.run([sys.executable, "-c", code], cwd=MUSIC_DIR, env=env, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"